@@ -0,0 +1,96 @@
+import numpy as np
+from AI.PositionScore import PIECES, MIDDLEGAME_TABLES, ENDGAME_TABLES, PHASE_TABLES, TOTAL_PHASE, SCORE_STEP
+from AI.PawnStructure import DOUBLED_PAWN_PENALTY, ISOLATED_PAWN_PENALTY, PASSED_PAWN_BONUS
+
+"""
+    Batch evaluation
+
+    Evaluates many positions in one call, for offline analysis and tuning. A position is encoded as 64 int8 piece codes
+    (square = row * 8 + col, 0 for an empty square, see PIECE_CODES), so N positions are an (N, 64) int8 array.
+    The flat tables of PositionScore are stacked into (13, 64) arrays, black's negated, and every term is a gather
+    over the whole batch followed by a sum per position, the pawn structure terms (see PawnStructure) being counted
+    on (N, 8, 8) boolean pawn boards. The scores are the ones of ChessAI.evaluateBasedOnNumPiece,
+    to the last bit, as the tables only hold multiples of SCORE_STEP and the taper does the same operations.
+"""
+EMPTY = 0
+PIECE_CODES = {piece: code for code, piece in enumerate(PIECES, 1)}
+
+def createSignedArray(tables, signed: bool = True):
+    """
+        (13, 64) array of [tables], row 0 for an empty square, black's scores negated if [signed]
+    """
+    array = np.zeros((len(PIECES) + 1, 64))
+    for piece, code in PIECE_CODES.items():
+        array[code] = tables[piece] if piece[0] == "w" or not signed else np.negative(tables[piece])
+    return array
+
+MIDDLEGAME_ARRAY = createSignedArray(MIDDLEGAME_TABLES)
+ENDGAME_ARRAY = createSignedArray(ENDGAME_TABLES)
+PHASE_ARRAY = createSignedArray(PHASE_TABLES, signed = False)
+SQUARES = np.arange(64)
+
+# Passed pawn bonus of a white pawn on each row, black's rows being flipped (see evaluatePawnBoards)
+PASSED_PAWN_ROW_BONUS = [np.array([bonus[7 - row] for row in range(8)]) for bonus in PASSED_PAWN_BONUS]
+
+def encodeBoard(board) -> np.ndarray:
+    """
+        64 int8 piece codes of an 8x8 [board] of "wP" / "--" strings
+    """
+    return np.array([PIECE_CODES.get(piece, EMPTY) for row in board for piece in row], dtype = np.int8)
+
+def encodeBoards(gameStates) -> np.ndarray:
+    """
+        (N, 64) int8 array of the boards of [gameStates]
+    """
+    boards = np.zeros((len(gameStates), 64), dtype = np.int8)
+    for index, gameState in enumerate(gameStates):
+        boards[index] = encodeBoard(gameState.board)
+    return boards
+
+def evaluatePawnBoards(pawns: np.ndarray, enemyPawns: np.ndarray):
+    """
+        [pawns], [enemyPawns] - (N, 8, 8) boolean boards, [pawns] advancing towards row 0
+        Returns the (middlegameScores, endgameScores) of [pawns], same terms as PawnStructure.evaluateColorPawns
+    """
+    fileCounts = pawns.sum(axis = 1)
+    doubledPawns = np.maximum(fileCounts - 1, 0).sum(axis = 1)
+    hasPawns = fileCounts > 0
+    adjacentPawns = np.zeros_like(hasPawns)
+    adjacentPawns[:, 1:] |= hasPawns[:, :-1]
+    adjacentPawns[:, :-1] |= hasPawns[:, 1:]
+    isolatedPawns = np.where(hasPawns & ~adjacentPawns, fileCounts, 0).sum(axis = 1)
+
+    # Enemy pawns on each file or the adjacent ones, then whether one stands on a row in front of each square
+    enemyFiles = enemyPawns.copy()
+    enemyFiles[:, :, 1:] |= enemyPawns[:, :, :-1]
+    enemyFiles[:, :, :-1] |= enemyPawns[:, :, 1:]
+    enemyInFront = np.zeros_like(enemyFiles)
+    enemyInFront[:, 1:] = np.logical_or.accumulate(enemyFiles, axis = 1)[:, :-1]
+    passedPawns = pawns & ~enemyInFront
+
+    scores = []
+    for phase in range(2):
+        passedBonus = (passedPawns * PASSED_PAWN_ROW_BONUS[phase][:, None]).sum(axis = (1, 2))
+        scores.append(doubledPawns * DOUBLED_PAWN_PENALTY[phase] + isolatedPawns * ISOLATED_PAWN_PENALTY[phase] + passedBonus)
+    return scores
+
+def evaluateBatch(boards: np.ndarray) -> np.ndarray:
+    """
+        [boards] - (N, 64) int8 array of encoded positions, see encodeBoards
+        Returns the N material, position and pawn structure scores, higher points -> White advantage
+    """
+    codes = np.asarray(boards, dtype = np.intp)
+    middlegameScores = MIDDLEGAME_ARRAY[codes, SQUARES].sum(axis = 1)
+    endgameScores = ENDGAME_ARRAY[codes, SQUARES].sum(axis = 1)
+    phases = np.minimum(PHASE_ARRAY[codes, SQUARES].sum(axis = 1), TOTAL_PHASE)
+
+    squares = codes.reshape(-1, 8, 8)
+    whitePawns, blackPawns = squares == PIECE_CODES["wP"], squares == PIECE_CODES["bP"]
+    whiteMiddlegame, whiteEndgame = evaluatePawnBoards(whitePawns, blackPawns)
+    blackMiddlegame, blackEndgame = evaluatePawnBoards(blackPawns[:, ::-1], whitePawns[:, ::-1])
+    middlegameScores += whiteMiddlegame - blackMiddlegame
+    endgameScores += whiteEndgame - blackEndgame
+
+    scores = (middlegameScores * phases + endgameScores * (TOTAL_PHASE - phases)) / TOTAL_PHASE
+    # np.round rounds halves to even, as round does in PositionScore.taperScore
+    return np.round(scores / SCORE_STEP) * SCORE_STEP
@@ -0,0 +1,224 @@
+import io
+import random
+import time
+from contextlib import redirect_stdout
+from AI.ChessAI import ChessAI
+from AI.ParallelSearch import searchRootMoves
+from AI.BatchEvaluation import encodeBoards, evaluateBatch
+from domain.chess.ChessEngine import GameState
+from domain.chess.BitboardEngine import BitboardGameState
+import domain.chess.PackedMove as PackedMove
+
+"""
+    Search benchmark
+
+    Searches a fixed set of positions to a fixed depth with different ChessAI configurations and reports
+    the nodes visited, the time taken and the move chosen, so the effect of a search change can be measured.
+"""
+BENCHMARK_POSITIONS = [
+    ("startpos", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"),
+    ("italian", "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4"),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"),
+    ("middlegame", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10"),
+    ("endgame", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1"),
+]
+
+# Each configuration adds one search feature to the previous one, the selective ones also on their own
+_SELECTIVE_OFF = {"useNullMovePruning": False, "useLateMoveReductions": False}
+
+# name -> ChessAI keyword arguments
+CONFIGURATIONS = {
+    "unordered": {"useMoveOrdering": False, "useQuiescence": False, "usePrincipalVariationSearch": False, **_SELECTIVE_OFF},
+    "ordered": {"useMoveOrdering": True, "useQuiescence": False, "usePrincipalVariationSearch": False, **_SELECTIVE_OFF},
+    "quiescence": {"useMoveOrdering": True, "useQuiescence": True, "usePrincipalVariationSearch": False, **_SELECTIVE_OFF},
+    "pvs": {"useMoveOrdering": True, "useQuiescence": True, "usePrincipalVariationSearch": True, **_SELECTIVE_OFF},
+    "nullmove": {"useMoveOrdering": True, "useQuiescence": True, "usePrincipalVariationSearch": True, "useNullMovePruning": True, "useLateMoveReductions": False},
+    "lmr": {"useMoveOrdering": True, "useQuiescence": True, "usePrincipalVariationSearch": True, "useNullMovePruning": False, "useLateMoveReductions": True},
+    "selective": {"useMoveOrdering": True, "useQuiescence": True, "usePrincipalVariationSearch": True, "useNullMovePruning": True, "useLateMoveReductions": True},
+}
+
+class BenchmarkResult:
+    def __init__(self, position: str, configuration: str, nodes: int, seconds: float, move: str):
+        self.position = position
+        self.configuration = configuration
+        self.nodes = nodes
+        self.seconds = seconds
+        self.move = move
+
+def searchPosition(fen: str, depth: int, aiArguments, useBitboard: bool = False, iterative: bool = False):
+    """
+        Searches [fen] to [depth] plies with a fresh ChessAI built from [aiArguments], with iterative deepening
+        (and so aspiration windows) if [iterative].
+        Returns (nodes, seconds, move notation)
+    """
+    gameState = BitboardGameState() if useBitboard else GameState()
+    gameState.loadFEN(fen)
+    ai = ChessAI(**aiArguments)
+    validMoves = gameState.getAllValidMoves(gameState.whiteTurn)
+
+    startTime = time.time()
+    with redirect_stdout(io.StringIO()): # The search prints its own progress
+        if iterative:
+            move = ai.iterativeDeepening(gameState, validMoves, maxDepth = depth)
+            nodes = ai.lastSearchNodes
+        else:
+            ai.prepareSearch()
+            move, _, _ = ai.searchRoot(gameState, ai.orderRootMoves(gameState, validMoves), depth)
+            nodes = ai.count
+    return nodes, time.time() - startTime, move.getChessNotation()
+
+def runBenchmark(depth: int, configurations = None, positions = None, useBitboard: bool = False, iterative: bool = False):
+    """
+        Returns a BenchmarkResult for every (position, configuration) pair
+    """
+    configurations = CONFIGURATIONS if configurations == None else configurations
+    positions = BENCHMARK_POSITIONS if positions == None else positions
+    results = []
+    for positionName, fen in positions:
+        for configurationName, aiArguments in configurations.items():
+            nodes, seconds, move = searchPosition(fen, depth, aiArguments, useBitboard, iterative)
+            results.append(BenchmarkResult(positionName, configurationName, nodes, seconds, move))
+    return results
+
+def printResults(results):
+    print(f"{'position':<12}{'configuration':<16}{'nodes':>10}{'time':>10}  move")
+    totals = {}
+    for result in results:
+        print(f"{result.position:<12}{result.configuration:<16}{result.nodes:>10}{result.seconds:>9.2f}s  {result.move}")
+        nodes, seconds = totals.get(result.configuration, (0, 0.0))
+        totals[result.configuration] = (nodes + result.nodes, seconds + result.seconds)
+    for configuration, (nodes, seconds) in totals.items():
+        print(f"{'total':<12}{configuration:<16}{nodes:>10}{seconds:>9.2f}s")
+
+def runParallelBenchmark(depth: int, workerCounts, aiArguments = None, positions = None, useBitboard: bool = False):
+    """
+        Searches every position to [depth] plies with ParallelSearch.searchRootMoves for each worker count of [workerCounts],
+        1 worker searching in this process. Returns a BenchmarkResult per (position, worker count), named "<count> workers".
+        Each worker count gets a fresh A.I, whose pool is started before the clock, so only the search itself is timed
+    """
+    aiArguments = {} if aiArguments == None else aiArguments
+    positions = BENCHMARK_POSITIONS if positions == None else positions
+    results = []
+    for workers in workerCounts:
+        ai = ChessAI(useBitboard = useBitboard, workers = workers, **aiArguments)
+        pool = ai.getPool() if workers > 1 else None
+        for positionName, fen in positions:
+            gameState = BitboardGameState() if useBitboard else GameState()
+            gameState.loadFEN(fen)
+            rootMoves = ai.orderRootMoves(gameState, gameState.getAllValidMoves(gameState.whiteTurn))
+            startTime = time.time()
+            move, _, nodes, _ = searchRootMoves(pool, ai, fen, rootMoves, depth)
+            results.append(BenchmarkResult(positionName, f"{workers} workers", nodes, time.time() - startTime, move.getChessNotation()))
+        ai.close()
+    return results
+
+def printSpeedup(results):
+    """
+        Prints the total time of each worker count of runParallelBenchmark results, and its speedup over the first one
+    """
+    totals = {}
+    for result in results:
+        totals[result.configuration] = totals.get(result.configuration, 0.0) + result.seconds
+    baseline = next(iter(totals.values()), 0.0)
+    for configuration, seconds in totals.items():
+        print(f"{configuration:<12}{seconds:>9.2f}s  speedup = {baseline / seconds if seconds > 0 else 0:.2f}x")
+
+def createRandomPositions(count: int, seed: int = 0, maxPlies: int = 80, positions = None):
+    """
+        Returns [count] GameStates reached by random moves from the benchmark positions, the same for the same [seed]
+    """
+    positions = BENCHMARK_POSITIONS if positions == None else positions
+    generator = random.Random(seed)
+    gameStates = []
+    while len(gameStates) < count:
+        gameState = GameState()
+        gameState.loadFEN(generator.choice(positions)[1])
+        for _ in range(generator.randrange(maxPlies)):
+            validMoves = gameState.getAllValidMoves(gameState.whiteTurn)
+            if len(validMoves) == 0: break
+            gameState.performMove(generator.choice(validMoves))
+        gameStates.append(gameState)
+    return gameStates
+
+def runEvaluationBenchmark(count: int, seed: int = 0):
+    """
+        Evaluates [count] random positions one at a time (ChessAI.evaluatePieceByPiece) and in one batch
+        (BatchEvaluation.evaluateBatch), checks that both give the same scores and prints the positions per second of each
+    """
+    gameStates = createRandomPositions(count, seed)
+    ai = ChessAI()
+
+    startTime = time.time()
+    scalarScores = [ai.evaluatePieceByPiece(gameState) for gameState in gameStates]
+    scalarSeconds = time.time() - startTime
+
+    startTime = time.time()
+    boards = encodeBoards(gameStates)
+    encodeSeconds = time.time() - startTime
+    startTime = time.time()
+    batchScores = evaluateBatch(boards)
+    batchSeconds = time.time() - startTime
+
+    mismatches = sum(1 for scalar, batch in zip(scalarScores, batchScores) if scalar != batch)
+    print(f"{'evaluation':<12}{'positions':>10}{'time':>10}{'positions/s':>14}")
+    for name, seconds in (("scalar", scalarSeconds), ("batch", batchSeconds), ("encoding", encodeSeconds)):
+        print(f"{name:<12}{count:>10}{seconds:>9.3f}s{count / seconds if seconds > 0 else 0:>14.0f}")
+    print(f"mismatches = {mismatches}")
+    return mismatches
+
+
+def playRandomGames(gameStateClass, count: int, seed: int = 0, maxPlies: int = 120, undoRate: float = 0.2, positions = None):
+    """
+        Yields a [gameStateClass] game state [count] times, after each random packed move applied to it or undone from it
+        (one in [undoRate]), starting a new game from a benchmark position every at most [maxPlies] moves.
+        The same game state object is yielded until its game ends, the same moves for the same [seed]
+    """
+    positions = BENCHMARK_POSITIONS if positions == None else positions
+    generator = random.Random(seed)
+    yielded = 0
+    while yielded < count:
+        gameState = gameStateClass()
+        gameState.loadFEN(generator.choice(positions)[1])
+        appliedMoves = 0
+        for _ in range(generator.randrange(1, maxPlies)):
+            validMoves = gameState.getAllValidPackedMoves(gameState.whiteTurn)
+            if len(validMoves) == 0: break
+            if appliedMoves > 0 and generator.random() < undoRate:
+                gameState.undoPackedMove()
+                appliedMoves -= 1
+            else:
+                move = generator.choice(validMoves)
+                # Every promotion piece, not only the one the generator encodes
+                if PackedMove.getFlag(move) == PackedMove.PROMOTION_FLAG:
+                    move = PackedMove.encode(PackedMove.getStartSquare(move), PackedMove.getEndSquare(move), PackedMove.PROMOTION_FLAG,
+                                             generator.choice(PackedMove.PROMOTION_PIECES[1:]))
+                gameState.applyPackedMove(move)
+                appliedMoves += 1
+            yield gameState
+            yielded += 1
+            if yielded == count: return
+
+def runIncrementalBenchmark(count: int, seed: int = 0):
+    """
+        Plays random games of applied and undone moves (see playRandomGames) on both engines and after each of the [count]
+        moves per engine checks the incremental score against a full recompute: GameState.pieceScores against
+        GameState.computePieceScores, and ChessAI.evaluateBasedOnNumPiece against evaluatePieceByPiece.
+        Prints the positions per second of each evaluation and the mismatches per engine, and returns their total
+    """
+    ai = ChessAI()
+    totalMismatches = 0
+    print(f"{'engine':<12}{'positions':>10}{'incremental':>14}{'recompute':>14}{'mismatches':>12}")
+    for name, gameStateClass in (("array", GameState), ("bitboard", BitboardGameState)):
+        mismatches, incrementalSeconds, recomputeSeconds = 0, 0.0, 0.0
+        for gameState in playRandomGames(gameStateClass, count, seed):
+            startTime = time.time()
+            incrementalScore = ai.evaluateBasedOnNumPiece(gameState) # Sets the score tables of a new game first
+            incrementalSeconds += time.time() - startTime
+            startTime = time.time()
+            recomputeScore = ai.evaluatePieceByPiece(gameState)
+            recomputeSeconds += time.time() - startTime
+            if incrementalScore != recomputeScore or gameState.pieceScores != gameState.computePieceScores(): mismatches += 1
+        print(f"{name:<12}{count:>10}{count / incrementalSeconds if incrementalSeconds > 0 else 0:>12.0f}/s"
+              f"{count / recomputeSeconds if recomputeSeconds > 0 else 0:>12.0f}/s{mismatches:>12}")
+        totalMismatches += mismatches
+    return totalMismatches
\ No newline at end of file
@@ -1,180 +1,661 @@
 import random
 from domain.chess.Status import Status
-from domain.chess.ChessEngine import ChessEngine
+import domain.chess.ChessEngine as ChessEngine
+from domain.chess.BitboardEngine import BitboardGameState
+import domain.chess.PackedMove as PackedMove
 from AI.PositionScore import *
+from AI.TranspositionTable import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+from AI.PawnHashTable import PawnHashTable
+from AI.PawnStructure import getPawnMasks, evaluatePawnStructure
+import AI.ParallelSearch as ParallelSearch
+from AI.OpeningBook import OpeningBook
 import time
-import math
+from itertools import chain
 
 class ChessAI:
-    CHECKMATE_VALUE = math.inf #math
     STALEMATE_VALUE = 0
 
-    def __init__(self) -> None:
+    MAX_SEARCH_DEPTH = 64
+    MAX_PLY = 128
+
+    # Being mated [ply] plies from the root scores -(CHECKMATE_VALUE - ply), so a faster mate scores higher and a slower
+    # defeat less low. Every mate score is beyond MATE_THRESHOLD, far above any evaluation, and INFINITE_SCORE is above all scores
+    CHECKMATE_VALUE = 100000
+    MATE_THRESHOLD = CHECKMATE_VALUE - MAX_PLY
+    INFINITE_SCORE = CHECKMATE_VALUE + 1
+    BUDGET_CHECK_INTERVAL = 1024 # Nodes between two clock reads (and cancel checks), must be a power of two
+
+    # The king is worth nothing to the evaluation, but is the last piece that should capture
+    KING_ATTACKER_VALUE = 10
+
+    MAX_QUIESCENCE_DEPTH = 6 # Plies of captures searched past the leaves at most
+    DELTA_MARGIN = 20 # Two pawns in evaluation units, the most a quiet position change is assumed to be worth
+
+    NULL_WINDOW = 0.5 # Smallest difference between two scores, the position scores move in steps of 0.5
+    ASPIRATION_WINDOW = 5 # Half a pawn in evaluation units on either side of the previous iteration's score
+
+    NULL_MOVE_MIN_DEPTH = 3 # Remaining depth from which a null move is tried
+    NULL_MOVE_REDUCTION = 2 # Plies the null move search is shallower than the normal one, besides the passed turn
+    LATE_MOVE_MIN_DEPTH = 3 # Remaining depth from which late moves are reduced
+    LATE_MOVE_INDEX = 3 # Moves searched at full depth before the reductions start
+    LATE_MOVE_REDUCTION = 1
+
+    def __init__(self, useBitboard = False, transpositionTableMB = 32, searchDepth = 2, useMoveOrdering = True, useQuiescence = True,
+                 usePrincipalVariationSearch = True, useAspirationWindows = True, useNullMovePruning = True, useLateMoveReductions = True,
+                 workers = 1, openingBookPath = None, bookSelection = OpeningBook.WEIGHTED, pawnHashTableMB = 2) -> None:
+        """
+            [useBitboard] - Search on a BitboardGameState copy of the given gameState
+            [transpositionTableMB] - Memory budget of the transposition table
+            [searchDepth] - Depth searched by generateMove when it is given no time or node budget
+            [useMoveOrdering] - Order captures by MVV-LVA and quiet moves by the killer and history heuristics
+            [useQuiescence] - Extend the leaves with captures until the position is quiet (see quiescence)
+            [usePrincipalVariationSearch] - Search every move but the first with a null window (see negaMaxAlphaBeta)
+            [useAspirationWindows] - Start each iteration of iterativeDeepening with a window around the previous score
+            [useNullMovePruning] - Cut off nodes where passing the turn already beats beta (see tryNullMove)
+            [useLateMoveReductions] - Search the late quiet moves of a node less deep (see negaMaxAlphaBeta)
+            [workers] - Processes generateMove splits the root moves across, 1 to search in the calling process (see ParallelSearch)
+            [openingBookPath] - Polyglot book generateMove plays from while the position is in it, None to always search
+            [bookSelection] - How a book move is picked, OpeningBook.WEIGHTED or OpeningBook.BEST
+            [pawnHashTableMB] - Memory budget of the pawn hash table, which caches the pawn structure terms of the evaluation
+        """
         self.pieceScore = {"K": 0,"Q": 9, "R": 5, "B": 3, "N": 3, "P": 1}
         self.count = 0
-        pass
-
-    def generateMove(self, gameState, validMoves):
+        self.lastSearchNodes = 0 # Nodes visited by the last generateMove, as count is reset afterwards
+        self.lastScore = None # Score of the last generateMove for the side that moved, None for a book move
+        self.useBitboard = useBitboard
+        self.transpositionTableMB = transpositionTableMB
+        self.searchDepth = searchDepth
+        self.useMoveOrdering = useMoveOrdering
+        self.useQuiescence = useQuiescence
+        self.usePrincipalVariationSearch = usePrincipalVariationSearch
+        self.useAspirationWindows = useAspirationWindows
+        self.useNullMovePruning = useNullMovePruning
+        self.useLateMoveReductions = useLateMoveReductions
+        self.workers = workers
+        self.openingBookPath = openingBookPath
+        self.bookSelection = bookSelection
+        self.openingBook = OpeningBook(openingBookPath, bookSelection) if openingBookPath != None else None
+        self.transpositionTable = TranspositionTable(transpositionTableMB)
+        self.pawnHashTableMB = pawnHashTableMB
+        self.pawnHashTable = PawnHashTable(pawnHashTableMB)
+        self.enforceBudget = False
+        self.cancelEvent = None
+        self.pool = None # Processes of the parallel search, started by its first search (see getPool)
+        self.setBudget()
+
+        # Two quiet moves per ply that caused a beta cutoff, and the cutoff count of every from/to square pair
+        self.killerMoves = [[None, None] for _ in range(self.MAX_PLY)]
+        self.history = [0] * 4096
+
+        # Best line found below each ply (triangular table) and the best line of the last completed search, packed moves
+        self.principalVariationTable = [[] for _ in range(self.MAX_PLY + 1)]
+        self.principalVariation = []
+
+    def generateMove(self, gameState, validMoves, timeLimit = None, nodeLimit = None):
+        """
+            Returns the move to play out of [validMoves], from the opening book if the position is in it.
+            With a [timeLimit] (seconds) and/or a [nodeLimit] the search deepens iteratively until the budget runs out,
+            otherwise it searches self.searchDepth plies
+        """
         startTime = time.time()
-        move = self.performMiniMax(gameState, validMoves, 2)
+        bookMove = self.openingBook.getMove(gameState, validMoves) if self.openingBook != None else None
+        if bookMove != None:
+            print("book move = %s" %(bookMove.getChessNotation()))
+            self.principalVariation = [PackedMove.fromMove(bookMove)]
+            self.lastScore = None
+            return bookMove
+
+        searchState, searchMoves = self.getSearchState(gameState, validMoves)
+        if self.workers > 1:
+            maxDepth = self.searchDepth if timeLimit == None and nodeLimit == None else self.MAX_SEARCH_DEPTH
+            searchMove = ParallelSearch.parallelIterativeDeepening(self, searchState, searchMoves, self.workers, timeLimit, nodeLimit, maxDepth)
+        elif timeLimit == None and nodeLimit == None: searchMove = self.performMiniMax(searchState, searchMoves, self.searchDepth)
+        else: searchMove = self.iterativeDeepening(searchState, searchMoves, timeLimit, nodeLimit)
+        move = self.matchMove(searchMove, validMoves)
         print(move)
+        print("principal variation = %s" %(" ".join(self.getPrincipalVariation())))
+        if self.lastScore != None: print("score = %s" %(self.formatScore(self.lastScore)))
         print("time taken = %s" %(time.time() - startTime))
         return move
     
-    def generateMoveWithQueue(self, gameState, validMoves, queue):
-        startTime = time.time()
-        move = self.performMiniMax(gameState, validMoves, 2)
-        print(move)
-        print("time taken = %s" %(time.time() - startTime))
-        queue.put(move)
+    def generateMoveWithQueue(self, gameState, validMoves, queue, timeLimit = None, nodeLimit = None):
+        """
+            Puts (move, principal variation, score) in [queue], as the search runs in another process
+        """
+        move = self.generateMove(gameState, validMoves, timeLimit, nodeLimit)
+        queue.put((move, self.getPrincipalVariation(), self.lastScore))
+
+    def getPrincipalVariation(self):
+        """
+            Returns the line the last search expects to be played, in coordinate notation (e.g. ["e2e4", "e7e5"])
+        """
+        return [PackedMove.toString(move) for move in self.principalVariation]
+
+    def getArguments(self):
+        """
+            Returns the constructor arguments of this A.I, to build the same one in another process
+        """
+        return {"useBitboard": self.useBitboard, "transpositionTableMB": self.transpositionTableMB, "searchDepth": self.searchDepth,
+                "useMoveOrdering": self.useMoveOrdering, "useQuiescence": self.useQuiescence,
+                "usePrincipalVariationSearch": self.usePrincipalVariationSearch, "useAspirationWindows": self.useAspirationWindows,
+                "useNullMovePruning": self.useNullMovePruning, "useLateMoveReductions": self.useLateMoveReductions, "workers": self.workers,
+                "openingBookPath": self.openingBookPath, "bookSelection": self.bookSelection, "pawnHashTableMB": self.pawnHashTableMB}
+
+    def getPool(self):
+        """
+            Returns the process pool of the parallel search (see ParallelSearch), started on the first call and kept
+            for the next searches, so that its processes are not spawned again for each move
+        """
+        if self.pool == None: self.pool = ParallelSearch.createPool(self, self.workers)
+        return self.pool
+
+    def close(self):
+        """
+            Stops the processes of the parallel search, the next parallel search starts them again
+        """
+        if self.pool == None: return
+        self.pool.terminate()
+        self.pool.join()
+        self.pool = None
+
+    def getSearchState(self, gameState, validMoves):
+        """
+            Returns the (gameState, validMoves) pair the search should run on
+        """
+        if not self.useBitboard or isinstance(gameState, BitboardGameState):
+            return gameState, validMoves
+        searchState = BitboardGameState.fromGameState(gameState)
+        return searchState, searchState.getAllValidMoves(searchState.whiteTurn)
+
+    def matchMove(self, move, validMoves):
+        """
+            Returns the Move object from [validMoves] equal to [move], so the caller gets back one of its own moves
+        """
+        for validMove in validMoves:
+            if validMove == move: return validMove
+        return move
 
     def getRandomMove(self, validMoves):
         if len(validMoves) == 0: return None
         return random.choice(validMoves)
+
+    """
+        Search budget
+    """
+    def setBudget(self, timeLimit = None, nodeLimit = None):
+        """
+            Limits the following searches to [timeLimit] seconds from now and [nodeLimit] nodes, None for no limit
+        """
+        self.deadline = time.time() + timeLimit if timeLimit != None else None
+        self.nodeLimit = nodeLimit
+        self.stopSearch = False
+
+    def setCancelEvent(self, cancelEvent):
+        """
+            [cancelEvent] - threading or multiprocessing Event another thread or process sets to stop the searches early,
+                            None for searches that only stop at their budget.
+            A cancelled search returns its best move so far, like one that ran out of time
+        """
+        if cancelEvent is not self.cancelEvent: self.close() # The pool workers share the event they were started with
+        self.cancelEvent = cancelEvent
+
+    def isCancelled(self) -> bool:
+        return self.cancelEvent != None and self.cancelEvent.is_set()
+
+    def isBudgetExhausted(self) -> bool:
+        """
+            Called once per node, the clock and the cancel event are only read every BUDGET_CHECK_INTERVAL nodes.
+            Once it returns True the search unwinds without storing anything and the current iteration is discarded
+        """
+        if self.stopSearch: return True
+        if self.nodeLimit != None and self.count >= self.nodeLimit: self.stopSearch = True
+        elif self.count & (self.BUDGET_CHECK_INTERVAL - 1) == 0:
+            if (self.deadline != None and time.time() >= self.deadline) or self.isCancelled(): self.stopSearch = True
+        return self.stopSearch
+
+    """
+        Root search
+    """
+    def iterativeDeepening(self, gameState: ChessEngine.GameState, validMoves, timeLimit = None, nodeLimit = None, maxDepth = MAX_SEARCH_DEPTH):
+        """
+            Searches depth 1, 2, 3 ... until the budget runs out and returns the best Move of the last completed depth.
+            Depth 1 always completes so there is a move to return. Each iteration starts with the previous best move,
+            and the transposition table carries the best moves of the inner nodes over to the next iteration
+        """
+        if len(validMoves) == 0: return None
+        startTime = time.time()
+        rootMoves = self.orderRootMoves(gameState, validMoves)
+        bestMove = rootMoves[0]
+        self.prepareSearch()
+        self.setBudget(timeLimit, nodeLimit)
+        principalVariation = [PackedMove.fromMove(bestMove)]
+        score = None
+
+        for depth in range(1, maxDepth + 1):
+            move, score, isCompleted = self.searchAspirationWindow(gameState, rootMoves, depth, score)
+            if not isCompleted: break
+
+            bestMove = move
+            principalVariation = self.principalVariation
+            rootMoves.remove(bestMove)
+            rootMoves.insert(0, bestMove)
+            self.lastScore = score
+            print(f"depth {depth}: {bestMove.getChessNotation()} score = {self.formatScore(score)}, nodes = {self.count}, "
+                  f"time = {time.time() - startTime:.2f}s, pv = {' '.join(self.getPrincipalVariation())}")
+
+            # A mate within the plies searched will not change with more depth, and an iteration that would not finish is not started
+            if self.isMateFound(score, depth) or self.isCancelled(): break
+            if timeLimit != None and time.time() - startTime > timeLimit / 2: break
+
+        print(f"number of counts = {self.count}, transposition table hit rate = {self.transpositionTable.hitRate():.2%}, "
+              f"pawn hash table hit rate = {self.pawnHashTable.hitRate():.2%}")
+        self.principalVariation = principalVariation # The unfinished iteration may have overwritten it
+        self.setBudget()
+        self.lastSearchNodes = self.count
+        self.count = 0
+        return bestMove
+
+    def searchAspirationWindow(self, gameState: ChessEngine.GameState, validMoves, depth, previousScore = None):
+        """
+            searchRoot with a window of ASPIRATION_WINDOW around [previousScore], the score of the previous iteration.
+            A narrow window cuts off more, but a score outside of it is only a bound: the window is then widened
+            on the failing side and the depth searched again. Depth 1 and mate scores use the full window
+        """
+        enforceBudget = depth > 1
+        if not self.useAspirationWindows or previousScore == None or depth == 1 or self.isMateScore(previousScore):
+            return self.searchRoot(gameState, validMoves, depth, enforceBudget)
+
+        delta = self.ASPIRATION_WINDOW
+        alpha, beta = previousScore - delta, previousScore + delta
+        while True:
+            move, score, isCompleted = self.searchRoot(gameState, validMoves, depth, enforceBudget, alpha, beta)
+            if not isCompleted: return move, score, isCompleted
+            delta *= 4
+            if score <= alpha: alpha = score - delta
+            elif score >= beta: beta = score + delta
+            else: return move, score, isCompleted
     
     def performMiniMax(self, gameState: ChessEngine.GameState, validMoves, depth):
+        """
+            Returns the best Move out of [validMoves], searching [depth] plies.
+            The search itself runs on packed moves (see PackedMove) to avoid creating Move objects
+        """
         if (depth == 0): return self.getRandomMove(validMoves)
-        turnMultiplier = 1 if gameState.whiteTurn else -1
-        maxEval = -float('Inf')
-        bestMove = None
+        self.prepareSearch()
+        self.setBudget()
+
+        # Only a cancel event can stop this search, which then returns the best move among the root moves searched
+        rootMoves = self.orderRootMoves(gameState, validMoves)
+        bestMove, score, _ = self.searchRoot(gameState, rootMoves, depth, enforceBudget = self.cancelEvent != None)
+        # Cancelled before any root move finished, the fallback move has no score
+        self.lastScore = score if bestMove != None else None
+        if bestMove == None and len(rootMoves) > 0: bestMove = rootMoves[0]
+
+        print(f"number of counts = {self.count}, transposition table hit rate = {self.transpositionTable.hitRate():.2%}, "
+              f"pawn hash table hit rate = {self.pawnHashTable.hitRate():.2%}")
+        self.lastSearchNodes = self.count
+        self.count = 0
+        return bestMove
 
+    def prepareSearch(self):
+        """
+            Resets the per search statistics and the killer moves, and ages the history so that older searches weigh less
+        """
         self.count = 0
+        self.transpositionTable.resetStatistics()
+        self.pawnHashTable.resetStatistics()
+        self.killerMoves = [[None, None] for _ in range(self.MAX_PLY)]
+        self.history = [value // 2 for value in self.history]
+
+    def searchRoot(self, gameState: ChessEngine.GameState, validMoves, depth, enforceBudget = False, alpha = -INFINITE_SCORE, beta = INFINITE_SCORE):
+        """
+            Searches every Move of [validMoves] to [depth] plies, in the given order, within the ([alpha], [beta]) window.
+            Returns (bestMove, score, isCompleted), score being from the side to move's point of view.
+            A score outside of the window is only a bound (see searchAspirationWindow).
+            With [enforceBudget] the search stops once the budget is exhausted, leaving isCompleted False
+        """
+        turnMultiplier = 1 if gameState.whiteTurn else -1
+        maxEval = -self.INFINITE_SCORE
+        bestMove = None
+        principalVariation = []
+        self.stopSearch = False
+        self.enforceBudget = enforceBudget
 
         # random.shuffle(validMoves)
 
         for move in validMoves:
             self.count += 1
-            gameState.performMove(move)
-            validMoves2 = gameState.getAllValidMoves(gameState.whiteTurn)
-            # eval = turnMultiplier * self.miniMax(gameState, validMoves2, depth - 1, gameState.whiteTurn)
-            eval = turnMultiplier * self.miniMaxAlphaBeta(gameState, validMoves2, depth - 1, -float('Inf'), float("Inf"), gameState.whiteTurn)
-            # eval = -self.negaMax(gameState, validMoves2, depth - 1, turnMultiplier = 1 if gameState.whiteTurn else -1)
-            # eval = -self.negaMaxAlphaBeta(gameState, validMoves2, depth - 1, -float('Inf'), float('Inf'), 1 if gameState.whiteTurn else -1)
-            
-            gameState.undoMove()
-
-            if eval > maxEval:
+            packedMove = PackedMove.fromMove(move)
+            self.makeMove(gameState, packedMove)
+            # The children generate their own moves, starting with their transposition table move.
+            # Only moves better than the best one so far matter, so alpha is raised to its score
+            eval = self.searchChild(gameState, depth - 1, alpha, beta, -turnMultiplier, 1, bestMove == None)
+            self.unmakeMove(gameState)
+            if self.stopSearch:
+                self.principalVariation = principalVariation
+                return bestMove, maxEval, False
+
+            # Every move may lose to a forced mate, still return one of them
+            if eval > maxEval or bestMove == None:
                 maxEval = eval
                 bestMove = move
+                principalVariation = [packedMove] + self.principalVariationTable[1]
+            alpha = max(alpha, eval)
+            if beta <= alpha: break
 
-        print(f"number of counts = {self.count}")
+        self.principalVariation = principalVariation
+        return bestMove, maxEval, True
+
+    def searchRootMove(self, gameState: ChessEngine.GameState, move, depth, alpha = -INFINITE_SCORE, deadline = None):
+        """
+            Searches the packed root [move] alone to [depth] plies, for ParallelSearch, which calls it on a fresh A.I,
+            so the move ordering tables are left as they are (see prepareSearch).
+            Returns (score, nodes, principalVariation), score being from the side to move's point of view and exact
+            if above [alpha], or None if the [deadline] (a time.time() value) passed first.
+            The budget is checked before searching, as tasks still queued in the pool would otherwise each search
+            BUDGET_CHECK_INTERVAL nodes before the first clock read
+        """
+        if (deadline != None and time.time() >= deadline) or self.isCancelled(): return None
         self.count = 0
-        return bestMove
+        self.setBudget(deadline - time.time() if deadline != None else None)
+        self.enforceBudget = deadline != None or self.cancelEvent != None
+        turnMultiplier = 1 if gameState.whiteTurn else -1
+
+        self.count += 1
+        self.makeMove(gameState, move)
+        score = -self.negaMaxAlphaBeta(gameState, None, depth - 1, -self.INFINITE_SCORE, -alpha, -turnMultiplier, 1)
+        principalVariation = [move] + self.principalVariationTable[1]
+        self.unmakeMove(gameState)
+        if self.stopSearch: return None
+        return score, self.count, principalVariation
+
+    def makeMove(self, gameState: ChessEngine.GameState, move):
+        """
+            Applies the packed [move] during the search.
+            Unlike GameState.performMove the game status is left untouched, as recomputing it means generating
+            every legal move of the new position. The search tells checkmate and stalemate apart from the
+            move lists it generates anyway (see evaluateLeaf and evaluateTerminal)
+        """
+        gameState.applyPackedMove(move)
+
+    def unmakeMove(self, gameState: ChessEngine.GameState):
+        gameState.undoPackedMove()
     
     """
         MiniMax Variation
     """
-    def miniMax(self, gameState: ChessEngine.GameState, validMoves, depth, whiteTurn):
-        self.count += 1
-        if depth == 0:
-            return self.evaluateBoard(gameState)
-
-        if whiteTurn:
-            maxEval = - float('Inf')
-            for move in validMoves:
-                gameState.performMove(move)
-                validMoves2 = gameState.getAllValidMoves(not whiteTurn)
-
-                eval = self.miniMax(gameState, validMoves2, depth - 1, not whiteTurn)
-                maxEval = max(maxEval, eval)
-
-                gameState.undoMove()
-            return maxEval
-        
-        else:
-            minEval = float('INF')
-            for move in validMoves:
-                gameState.performMove(move)
-                validMoves2 = gameState.getAllValidMoves(not whiteTurn)
-
-                eval = self.miniMax(gameState, validMoves2, depth - 1, not whiteTurn)
-                minEval = min(minEval, eval)
-
-                gameState.undoMove()
-        return minEval
-    
-    def miniMaxAlphaBeta(self, gameState: ChessEngine.GameState, validMoves, depth, alpha, beta, whiteTurn):
+    def miniMaxAlphaBeta(self, gameState: ChessEngine.GameState, validMoves, depth, alpha, beta, whiteTurn, ply = 1):
         """
             Alpha - Best Move for white
             Beta - Best for for black
+            Scores are from white's point of view. The search runs on negaMaxAlphaBeta, so that both
+            variations share the transposition table (whose scores are from the side to move's point of view)
+        """
+        if whiteTurn: return self.negaMaxAlphaBeta(gameState, validMoves, depth, alpha, beta, 1, ply)
+        return -self.negaMaxAlphaBeta(gameState, validMoves, depth, -beta, -alpha, -1, ply)
+    
+    """
+        NegaMax Variation
+    """  
+
+    def negaMaxAlphaBeta(self, gameState: ChessEngine.GameState, validMoves, depth, alpha, beta, turnMultiplier, ply = 1, allowNullMove = True): 
+        """
+            [validMoves] - moves to search, None to generate them lazily (see GameState.generateStagedMoves)
+                           with the transposition table move first. Children are always searched with None
+            [ply] - distance from the root, which indexes the killer moves and sets the distance of the mates found
+            [allowNullMove] - False right after a null move, two passes in a row would search the same position
+            The transposition table is probed before the moves are generated: an entry searched at least as deep either
+            returns straight away or narrows the window, away from the principal variation with principal variation search.
+            Without it every window is wide, so the entries are used at every node.
+            Late move reductions: once LATE_MOVE_INDEX moves are searched, the remaining quiet moves that do not give check
+            are expected to fail low and are first searched LATE_MOVE_REDUCTION plies less deep, see searchChild
+            Mate distance pruning: no score here can beat mating on the next ply nor be worse than being mated right now,
+            so a window outside of those returns straight away, which cuts the search short once a faster mate is known
         """
         self.count += 1
+        if ply < self.MAX_PLY: self.principalVariationTable[ply] = []
+        if self.enforceBudget and self.isBudgetExhausted(): return 0
+
+        alpha = max(alpha, -(self.CHECKMATE_VALUE - ply))
+        beta = min(beta, self.CHECKMATE_VALUE - ply - 1)
+        if alpha >= beta: return alpha
+
+        hashMove = None
+        if depth > 0:
+            entry = self.transpositionTable.probe(gameState.zobristKey)
+            if entry != None:
+                _, entryDepth, entryScore, entryBound, hashMove = entry
+                entryScore = self.scoreFromTable(entryScore, ply)
+                # With principal variation search, only away from the principal variation (null window), whose line would end here
+                if entryDepth >= depth and (beta - alpha <= self.NULL_WINDOW or not self.usePrincipalVariationSearch):
+                    if entryBound == EXACT: return entryScore
+                    elif entryBound == LOWER_BOUND: alpha = max(alpha, entryScore)
+                    else: beta = min(beta, entryScore)
+                    if beta <= alpha: return entryScore
+
+        isInCheck = depth > 0 and (self.useNullMovePruning or self.useLateMoveReductions) and gameState.inCheck(gameState.whiteTurn)
+        if allowNullMove and not isInCheck and depth >= self.NULL_MOVE_MIN_DEPTH and self.useNullMovePruning:
+            eval = self.tryNullMove(gameState, depth, beta, turnMultiplier, ply)
+            if self.stopSearch: return 0
+            if eval >= beta: return beta
+
+        isStaged = validMoves == None
+        if isStaged: validMoves = self.generateOrderedMoves(gameState, hashMove, ply)
         if depth == 0:
-            return self.evaluateBoard(gameState)
-        
-        if whiteTurn:
-            maxEval = - float('Inf')
-            for move in validMoves:
-                gameState.performMove(move)
-                validMoves = gameState.getAllValidMoves(gameState.whiteTurn)
+            # Quiescence relies on the captures coming first, which a list given by the caller does not promise
+            if self.useQuiescence: return self.quiescence(gameState, validMoves if isStaged else None, alpha, beta, turnMultiplier, ply = ply)
+            return turnMultiplier * self.evaluateLeaf(gameState, validMoves, ply)
 
-                eval = self.miniMaxAlphaBeta(gameState, validMoves, depth - 1, alpha, beta, gameState.whiteTurn)
-                maxEval = max(maxEval, eval)
-                alpha = max(alpha, eval)
+        canReduce = self.useLateMoveReductions and depth >= self.LATE_MOVE_MIN_DEPTH and not isInCheck
+        killers = self.killerMoves[ply] if ply < self.MAX_PLY else ()
+        originalAlpha = alpha
+        bestMove = None
+        maxEval = -self.INFINITE_SCORE
+        for moveIndex, move in enumerate(validMoves):
+            isLateMove = canReduce and moveIndex >= self.LATE_MOVE_INDEX and move not in killers and not self.isNoisyMove(gameState.board, move)
+            self.makeMove(gameState, move)
+            reduction = self.LATE_MOVE_REDUCTION if isLateMove and not gameState.inCheck(gameState.whiteTurn) else 0
+            eval = self.searchChild(gameState, depth - 1, alpha, beta, -turnMultiplier, ply + 1, bestMove == None, reduction)
+            self.unmakeMove(gameState)
+            if self.stopSearch: return 0 # Unfinished, nothing is stored
+
+            if eval > maxEval or bestMove == None:
+                maxEval = eval
+                bestMove = move
+            if eval > alpha:
+                alpha = eval
+                if ply < self.MAX_PLY: self.principalVariationTable[ply] = [move] + self.principalVariationTable[ply + 1]
+
+            if beta <= alpha:
+                self.updateMoveOrdering(gameState, move, depth, ply)
+                break
+
+        if bestMove == None:
+            maxEval = turnMultiplier * self.evaluateTerminal(gameState, ply)
+            bound = EXACT
+        elif maxEval <= originalAlpha: bound = UPPER_BOUND
+        elif maxEval >= beta: bound = LOWER_BOUND
+        else: bound = EXACT
+
+        # A fail low says little about which move is best, keep the previous one
+        self.transpositionTable.store(gameState.zobristKey, depth, self.scoreToTable(maxEval, ply), bound, hashMove if bound == UPPER_BOUND else bestMove)
+        return maxEval
 
-                gameState.undoMove()
+    def searchChild(self, gameState: ChessEngine.GameState, depth, alpha, beta, turnMultiplier, ply, isFirstMove, reduction = 0):
+        """
+            Searches the position after a move with negaMaxAlphaBeta and returns its score for the parent, with the
+            parent's ([alpha], [beta]) window and [ply] being the child's.
+            Principal variation search: the first move is expected to be the best one (it is the hash move or the best
+            ordered one), so the others only get a null window scout proving that they do not beat alpha.
+            A scout that does beat alpha is searched again with the full window to get its exact score.
+            With a [reduction] the move is first scouted that many plies less deep, and only searched at full depth
+            if it beats alpha. While alpha is only being mated, there is no bound worth scouting against
+        """
+        if isFirstMove or alpha <= -self.MATE_THRESHOLD:
+            return -self.negaMaxAlphaBeta(gameState, None, depth, -beta, -alpha, turnMultiplier, ply)
 
-                if beta <= alpha: 
-                    break
-            return maxEval
-        
-        else:
-            minEval = float('INF')
-            for move in validMoves:
-                gameState.performMove(move)
-                validMoves = gameState.getAllValidMoves(gameState.whiteTurn)
+        if reduction > 0:
+            eval = -self.negaMaxAlphaBeta(gameState, None, max(depth - reduction, 0), -alpha - self.NULL_WINDOW, -alpha, turnMultiplier, ply)
+            if eval <= alpha or self.stopSearch: return eval
 
-                eval = self.miniMaxAlphaBeta(gameState, validMoves, depth - 1, alpha, beta, gameState.whiteTurn)
-                minEval = min(minEval, eval)
-                beta = min(beta, eval)
+        if not self.usePrincipalVariationSearch:
+            return -self.negaMaxAlphaBeta(gameState, None, depth, -beta, -alpha, turnMultiplier, ply)
 
-                gameState.undoMove()
+        eval = -self.negaMaxAlphaBeta(gameState, None, depth, -alpha - self.NULL_WINDOW, -alpha, turnMultiplier, ply)
+        if alpha < eval < beta and not self.stopSearch:
+            eval = -self.negaMaxAlphaBeta(gameState, None, depth, -beta, -alpha, turnMultiplier, ply)
+        return eval
 
-                if beta <= alpha: break
+    def tryNullMove(self, gameState: ChessEngine.GameState, depth, beta, turnMultiplier, ply):
+        """
+            Null move pruning: lets the opponent move twice in a row and searches the result NULL_MOVE_REDUCTION plies
+            less deep with a null window at [beta]. Moving is almost always better than passing, so a score that
+            still reaches beta means the node would fail high anyway.
+            That does not hold in zugzwang, which is common once a side only has pawns left, so such a side never passes.
+            Nor does a mate found after passing, so a [beta] among the mate scores is not tried.
+            Returns the score of the null move for the side to move, -INFINITE_SCORE when it is not tried
+        """
+        if beta >= self.MATE_THRESHOLD or not self.hasPieces(gameState, gameState.whiteTurn): return -self.INFINITE_SCORE
 
-        return minEval
-    
-    """
-        NegaMax Variation
-    """  
+        enPassantSquare = gameState.applyNullMove()
+        eval = -self.negaMaxAlphaBeta(gameState, None, max(depth - 1 - self.NULL_MOVE_REDUCTION, 0), -beta, -beta + self.NULL_WINDOW,
+                                      -turnMultiplier, ply + 1, allowNullMove = False)
+        gameState.undoNullMove(enPassantSquare)
+        return eval
+
+    def hasPieces(self, gameState: ChessEngine.GameState, whiteTurn: bool) -> bool:
+        """
+            Checks if the given side has a piece other than its king and pawns
+        """
+        board = gameState.board
+        for square in gameState.pieceSquares["w" if whiteTurn else "b"]:
+            if board[square >> 3][square & 7][1] not in "KP": return True
+        return False
 
-    def negaMax(self, gameState: ChessEngine.GameState, validMoves, depth, turnMultiplier):
+    """
+        Quiescence search
+    """
+    def quiescence(self, gameState: ChessEngine.GameState, validMoves, alpha, beta, turnMultiplier, quiescenceDepth = 0, ply = 0):
+        """
+            Extends a leaf with captures and promotions until the position is quiet, so that it is not scored
+            in the middle of an exchange. Scores are from the side to move's point of view.
+                Stand pat - the side to move may decline every capture, so the static evaluation is a lower bound
+                Delta pruning - captures that cannot bring the score up to alpha, even with DELTA_MARGIN, are skipped
+            In check standing pat is not an option, so every evasion is searched instead.
+            At most MAX_QUIESCENCE_DEPTH plies are added, past that the static evaluation is returned
+            [validMoves] - staged moves of the position (captures first), None to generate them
+            [ply] - distance from the root, for the distance of the mates found
+        """
         self.count += 1
+        if self.enforceBudget and self.isBudgetExhausted(): return 0
+
+        if validMoves == None:
+            validMoves = gameState.generateStagedMoves(gameState.whiteTurn, captureOrder = self.getCaptureOrder(gameState.board) if self.useMoveOrdering else None)
+        validMoves = iter(validMoves)
+        firstMove = next(validMoves, None)
+        if firstMove == None: return turnMultiplier * self.evaluateTerminal(gameState, ply)
+
+        isInCheck = gameState.inCheck(gameState.whiteTurn)
+        standPat = turnMultiplier * self.evaluateBasedOnNumPiece(gameState)
+        if quiescenceDepth >= self.MAX_QUIESCENCE_DEPTH: return standPat
+        if isInCheck: maxEval = -self.INFINITE_SCORE
+        else:
+            if standPat >= beta: return standPat
+            alpha = max(alpha, standPat)
+            maxEval = standPat
 
-        if depth == 0 or gameState.status == Status.CHECKMATE or gameState.status == Status.STALEMATE:
-            return turnMultiplier * self.evaluateBoard(gameState)
+        board = gameState.board
+        for move in chain((firstMove,), validMoves):
+            if not isInCheck:
+                if not self.isNoisyMove(board, move): break # Captures come first, the rest of the moves are quiet
+                if standPat + self.getMaterialGain(board, move) + self.DELTA_MARGIN <= alpha: continue
 
-        maxEval = -float('Inf')
-        for move in validMoves:
-            gameState.performMove(move)
-            validMoves = gameState.getAllValidMoves(gameState.whiteTurn)
-            eval = -self.negaMax(gameState, validMoves, depth - 1, -turnMultiplier)
-            gameState.undoMove()
+            self.makeMove(gameState, move)
+            eval = -self.quiescence(gameState, None, -beta, -alpha, -turnMultiplier, quiescenceDepth + 1, ply + 1)
+            self.unmakeMove(gameState)
+            if self.stopSearch: return 0
 
             maxEval = max(maxEval, eval)
+            alpha = max(alpha, eval)
+            if beta <= alpha: break
 
         return maxEval
-    
-    def negaMaxAlphaBeta(self, gameState: ChessEngine.GameState, validMoves, depth, alpha, beta, turnMultiplier): 
-        self.count += 1
-
-        if depth == 0 or gameState.status == Status.CHECKMATE or gameState.status == Status.STALEMATE:
-            return turnMultiplier * self.evaluateBoard(gameState)
 
-        maxEval = -float('Inf')
-        for move in validMoves:
-            gameState.performMove(move)
+    def isNoisyMove(self, board, move) -> bool:
+        """
+            Checks if the packed [move] is a capture (en passant included) or a promotion on [board]
+        """
+        end = (move >> PackedMove.END_SHIFT) & PackedMove.SQUARE_MASK
+        flag = (move >> PackedMove.FLAG_SHIFT) & PackedMove.FLAG_MASK
+        return board[end >> 3][end & 7] != "--" or flag == PackedMove.EN_PASSANT_FLAG or flag == PackedMove.PROMOTION_FLAG
 
-            validMoves = gameState.getAllValidMoves(gameState.whiteTurn)
-            eval = -self.negaMaxAlphaBeta(gameState, validMoves, depth - 1, -beta, -alpha, -turnMultiplier)
-            alpha = max(alpha, eval)
-            maxEval = max(maxEval, eval)
+    def getMaterialGain(self, board, move):
+        """
+            Material won by the packed [move] in evaluation units: the piece captured plus the promotion gain
+        """
+        end = (move >> PackedMove.END_SHIFT) & PackedMove.SQUARE_MASK
+        flag = (move >> PackedMove.FLAG_SHIFT) & PackedMove.FLAG_MASK
+        victim = board[end >> 3][end & 7]
+        if flag == PackedMove.EN_PASSANT_FLAG: gain = self.pieceScore["P"]
+        else: gain = self.pieceScore[victim[1]] if victim != "--" else 0
+        if flag == PackedMove.PROMOTION_FLAG: gain += self.pieceScore[PackedMove.PROMOTION_PIECES[move >> PackedMove.PROMOTION_SHIFT]] - self.pieceScore["P"]
+        return gain * 10
 
-            gameState.undoMove()
+    """
+        Move ordering
+    """
+    def generateOrderedMoves(self, gameState: ChessEngine.GameState, hashMove, ply):
+        """
+            Staged legal moves of the side to move: the hash move, captures by MVV-LVA, the killer moves of [ply],
+            then the quiet moves by history score
+        """
+        if not self.useMoveOrdering: return gameState.generateStagedMoves(gameState.whiteTurn, hashMove)
+        history = self.history
+        return gameState.generateStagedMoves(gameState.whiteTurn, hashMove, self.killerMoves[ply] if ply < self.MAX_PLY else (),
+                                             self.getCaptureOrder(gameState.board), lambda move: history[move & 0xFFF])
 
-            if beta <= alpha: break
+    def getCaptureOrder(self, board):
+        """
+            Returns the sort key of the captures (and promotions) on [board]: most valuable victim first,
+            then least valuable attacker, both valued with pieceScore
+        """
+        pieceScore = self.pieceScore
+        def captureScore(move):
+            start = move & PackedMove.SQUARE_MASK
+            end = (move >> PackedMove.END_SHIFT) & PackedMove.SQUARE_MASK
+            flag = (move >> PackedMove.FLAG_SHIFT) & PackedMove.FLAG_MASK
+            victim = board[end >> 3][end & 7]
+            if flag == PackedMove.EN_PASSANT_FLAG: victimValue = pieceScore["P"]
+            else: victimValue = pieceScore[victim[1]] if victim != "--" else 0
+            if flag == PackedMove.PROMOTION_FLAG: victimValue += pieceScore[PackedMove.PROMOTION_PIECES[move >> PackedMove.PROMOTION_SHIFT]]
+            attacker = board[start >> 3][start & 7][1]
+            return victimValue * 16 - (self.KING_ATTACKER_VALUE if attacker == "K" else pieceScore[attacker])
+        return captureScore
+
+    def orderRootMoves(self, gameState: ChessEngine.GameState, validMoves):
+        """
+            Returns the root Moves with the captures first, by MVV-LVA. The sort is stable, so quiet moves keep their order
+        """
+        if not self.useMoveOrdering: return list(validMoves)
+        captureScore = self.getCaptureOrder(gameState.board)
+        def rootScore(move):
+            if move.pieceCaptured == "--" and move.piecePromotion == None: return (0, 0)
+            return (1, captureScore(PackedMove.fromMove(move)))
+        return sorted(validMoves, key = rootScore, reverse = True)
+
+    def updateMoveOrdering(self, gameState: ChessEngine.GameState, move, depth, ply):
+        """
+            Records a quiet [move] that caused a beta cutoff as a killer of [ply] and in the history table.
+            Captures are already ordered well by MVV-LVA
+        """
+        if not self.useMoveOrdering or self.isNoisyMove(gameState.board, move): return
 
-        return maxEval
+        if ply < self.MAX_PLY:
+            killers = self.killerMoves[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+        self.history[move & 0xFFF] += depth * depth
 
     # Make Move based on the score evaluation one step ahead
     def getGreedyMove(self, gameState: ChessEngine.GameState, validMoves):
@@ -182,40 +663,119 @@ class ChessAI:
             If its white Turn, turn multiplier is 1 and if evaluate board is high, then score is high
             If its black Turn, turn multiplier is -1 and if evaluate board is low, then score is high 
             Eitherway, we want to find the best possible score
+            [validMoves] are packed moves, as used throughout the search
         """
         turnMultiplier = 1 if gameState.whiteTurn else -1
-        bestScore = - self.CHECKMATE_VALUE
+        bestScore = -self.INFINITE_SCORE
         bestMove = None
         for move in validMoves:
-            gameState.performMove(move)
-            score = turnMultiplier * self.evaluateBoard(gameState)
-            if score > bestScore:
+            self.makeMove(gameState, move)
+            score = turnMultiplier * self.evaluateLeaf(gameState, gameState.generateStagedMoves(gameState.whiteTurn))
+            if score > bestScore or bestMove == None:
                 bestScore = score
                 bestMove = move
-            gameState.undoMove()
+            self.unmakeMove(gameState)
         return bestMove
     
+    """
+        Mate scores
+    """
+    def isMateScore(self, score) -> bool:
+        return abs(score) >= self.MATE_THRESHOLD
+
+    def getMateMoves(self, score) -> int:
+        """
+            Number of moves (not plies) to the mate of a mate [score], counted from the side to move
+        """
+        return (self.CHECKMATE_VALUE - abs(score) + 1) // 2
+
+    def isMateFound(self, score, depth) -> bool:
+        """
+            Checks if [score] is a mate within the [depth] plies searched, which a deeper search cannot make faster
+        """
+        return self.isMateScore(score) and self.CHECKMATE_VALUE - abs(score) <= depth
+
+    def formatScore(self, score) -> str:
+        """
+            "mate in N" when the side to move mates in N moves, "mated in N" when it is mated, the score otherwise
+        """
+        if not self.isMateScore(score): return str(score)
+        return f"{'mate' if score > 0 else 'mated'} in {self.getMateMoves(score)}"
+
+    def scoreToTable(self, score, ply):
+        """
+            Mate scores count their plies from the root, the transposition table stores them counted from the position
+            instead, as the same position may be reached at another ply
+        """
+        if score >= self.MATE_THRESHOLD: return score + ply
+        if score <= -self.MATE_THRESHOLD: return score - ply
+        return score
+
+    def scoreFromTable(self, score, ply):
+        """
+            Reverse of scoreToTable for a position reached [ply] plies from the root
+        """
+        if score >= self.MATE_THRESHOLD: return score - ply
+        if score <= -self.MATE_THRESHOLD: return score + ply
+        return score
+
     """
         Evaluating board functions
     """
     def evaluateBoard(self, gameState):
         """
             Higher points -> White advantage
+            Relies on gameState.status, so only for positions reached through GameState.performMove
         """
         if gameState.status == Status.CHECKMATE: 
-            return self.CHECKMATE_VALUE if gameState.whiteTurn else - self.CHECKMATE_VALUE
+            return - self.CHECKMATE_VALUE if gameState.whiteTurn else self.CHECKMATE_VALUE
         elif gameState.status == Status.STALEMATE:
             return self.STALEMATE_VALUE
         
-        return self.evaluateBasedOnNumPiece(gameState.board)
+        return self.evaluateBasedOnNumPiece(gameState)
 
-    def evaluateBasedOnNumPiece(self, board):
-        score = 0
-        for row in range(len(board)):
-            for col in range(len(board[row])):
-                currentPiece = board[row][col]
+    def evaluateLeaf(self, gameState, validMoves, ply = 0):
+        """
+            Same as evaluateBoard for a search node, whose status is not kept up to date.
+            Only the first move of [validMoves] is needed to know whether the game is over
+        """
+        for _ in validMoves:
+            return self.evaluateBasedOnNumPiece(gameState)
+        return self.evaluateTerminal(gameState, ply)
 
-                ## Eva;uate based on piece score and position
-                if currentPiece[0] == "w" : score += self.pieceScore[currentPiece[1]] * 10 + positionScore(currentPiece)[row][col] 
-                elif currentPiece[0] == "b": score -= self.pieceScore[currentPiece[1]] * 10 + positionScore(currentPiece)[row][col] 
-        return score
+    def evaluateTerminal(self, gameState, ply = 0):
+        """
+            Score of a position where the side to move has no legal moves, checkmate or stalemate.
+            [ply] - distance from the root, a mate scores less the further it is
+        """
+        if gameState.inCheck(gameState.whiteTurn):
+            return - (self.CHECKMATE_VALUE - ply) if gameState.whiteTurn else self.CHECKMATE_VALUE - ply
+        return self.STALEMATE_VALUE
+
+    def evaluateBasedOnNumPiece(self, gameState):
+        """
+            Material, position and pawn structure score. The first two are read from the piece scores the gameState updates
+            move by move (see GameState.setSquareScoreTables) and the last one from the pawn hash table, so in the common case
+            it costs the same whatever the number of pieces
+        """
+        if gameState.squareScoreTables is not SQUARE_SCORE_TABLES: gameState.setSquareScoreTables(SQUARE_SCORE_TABLES)
+        white, black = gameState.pieceScores["w"], gameState.pieceScores["b"]
+        _, pawnMiddlegameScore, pawnEndgameScore, _, _ = self.pawnHashTable.probe(gameState)
+        return taperScore(white[MIDDLEGAME] - black[MIDDLEGAME] + pawnMiddlegameScore, white[ENDGAME] - black[ENDGAME] + pawnEndgameScore,
+                          white[PHASE] + black[PHASE])
+
+    def evaluatePieceByPiece(self, gameState):
+        """
+            Same as evaluateBasedOnNumPiece, computed from scratch by visiting every piece
+        """
+        board = gameState.board
+        middlegameScore, endgameScore, phase = 0, 0, 0
+        for color, squares in gameState.pieceSquares.items():
+            sign = 1 if color == "w" else -1
+            for square in squares:
+                currentPiece = board[square >> 3][square & 7]
+                middlegameScore += sign * MIDDLEGAME_TABLES[currentPiece][square]
+                endgameScore += sign * ENDGAME_TABLES[currentPiece][square]
+                phase += PHASE_TABLES[currentPiece][square]
+        pawnMiddlegameScore, pawnEndgameScore, _, _ = evaluatePawnStructure(*getPawnMasks(gameState))
+        return taperScore(middlegameScore + pawnMiddlegameScore, endgameScore + pawnEndgameScore, phase)
@@ -0,0 +1,152 @@
+import mmap
+import os
+import random
+import struct
+from AI.PolyglotRandom import RANDOM_ARRAY
+import domain.chess.PackedMove as PackedMove
+
+"""
+    Polyglot opening book
+
+    A Polyglot .bin book is a sequence of 16 byte entries (key, move, weight, learn), big-endian and sorted by key,
+    the key being the Polyglot hash of the position (see getPolyglotKey). The file is memory mapped and binary searched
+    by key, so a book of any size opens instantly and only the pages probed are read.
+"""
+ENTRY_SIZE = 16
+ENTRY_FORMAT = ">QHHI"
+KEY_FORMAT = ">Q"
+
+# Piece numbers of the Polyglot random array, see PolyglotRandom
+POLYGLOT_PIECES = {"bP": 0, "wP": 1, "bN": 2, "wN": 3, "bB": 4, "wB": 5, "bR": 6, "wR": 7, "bQ": 8, "wQ": 9, "bK": 10, "wK": 11}
+CASTLE_OFFSET = 768
+EN_PASSANT_OFFSET = 772
+TURN_OFFSET = 780
+
+# (name, fen, Polyglot key) of the positions given as examples by the Polyglot format description.
+# The e3 square of "e4" is not hashed as no black pawn can take there, unlike d6, f6 and c3, and the king moves drop the castle rights
+REFERENCE_KEYS = [
+    ("startpos", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", 0x463B96181691FC9C),
+    ("e4", "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1", 0x823C9B50FD114196),
+    ("e4 d5", "rnbqkbnr/ppp1pppp/8/3p4/4P3/8/PPPP1PPP/RNBQKBNR w KQkq d6 0 2", 0x0756B94461C50FB0),
+    ("e4 d5 e5", "rnbqkbnr/ppp1pppp/8/3pP3/8/8/PPPP1PPP/RNBQKBNR b KQkq - 0 2", 0x662FAFB965DB29D4),
+    ("e4 d5 e5 f5", "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3", 0x22A48B5A8E47FF78),
+    ("e4 d5 e5 f5 Ke2", "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPPKPPP/RNBQ1BNR b kq - 0 3", 0x652A607CA3F242C1),
+    ("e4 d5 e5 f5 Ke2 Kf7", "rnbq1bnr/ppp1pkpp/8/3pPp2/8/8/PPPPKPPP/RNBQ1BNR w - - 0 4", 0x00FDD303C946BDD9),
+    ("a4 b5 h4 b4 c4", "rnbqkbnr/p1pppppp/8/8/PpP4P/8/1P1PPPP1/RNBQKBNR b KQkq c3 0 3", 0x3C8123EA7B067637),
+    ("a4 b5 h4 b4 c4 bxc3 Ra3", "rnbqkbnr/p1pppppp/8/8/P6P/R1p5/1P1PPPP1/1NBQKBNR b Kkq - 0 4", 0x5C3F9B829B279560),
+]
+
+def getPolyglotKey(gameState) -> int:
+    """
+        Polyglot hash of the position of [gameState]. Unlike GameState.zobristKey, the en passant file only counts
+        when a pawn of the side to move stands next to the pawn that can be taken
+    """
+    board = gameState.board
+    key = 0
+    for squares in gameState.pieceSquares.values():
+        for square in squares:
+            row, col = square >> 3, square & 7
+            key ^= RANDOM_ARRAY[64 * POLYGLOT_PIECES[board[row][col]] + 8 * (7 - row) + col]
+
+    # The castle rights mask bits are in the Polyglot order (see CastleRights)
+    for bit in range(4):
+        if gameState.castleRightsMask & (1 << bit): key ^= RANDOM_ARRAY[CASTLE_OFFSET + bit]
+
+    if gameState.enPassantSquare != ():
+        row, col = gameState.enPassantSquare
+        pawn, pawnRow = ("wP", row + 1) if gameState.whiteTurn else ("bP", row - 1)
+        if (col > 0 and board[pawnRow][col - 1] == pawn) or (col < 7 and board[pawnRow][col + 1] == pawn):
+            key ^= RANDOM_ARRAY[EN_PASSANT_OFFSET + col]
+
+    if gameState.whiteTurn: key ^= RANDOM_ARRAY[TURN_OFFSET]
+    return key
+
+def decodeMove(bookMove: int, board) -> int:
+    """
+        Packed move (see PackedMove) of a Polyglot move, without its flag as the book does not tell it.
+        Polyglot castles by taking the own rook with the king, which becomes the usual two squares king move
+    """
+    endRow, endCol = 7 - ((bookMove >> 3) & 7), bookMove & 7
+    startRow, startCol = 7 - ((bookMove >> 9) & 7), (bookMove >> 6) & 7
+    promotionPiece = PackedMove.PROMOTION_PIECES[(bookMove >> 12) & 7]
+    piece = board[startRow][startCol]
+    if piece[1] == "K" and startCol == 4 and board[endRow][endCol] == piece[0] + "R":
+        endCol = 6 if endCol == 7 else 2
+    return PackedMove.encode(startRow * 8 + startCol, endRow * 8 + endCol, promotionPiece = promotionPiece)
+
+class OpeningBook:
+    WEIGHTED = "weighted" # Random move, each as likely as its weight
+    BEST = "best" # Move of the highest weight
+
+    def __init__(self, path: str, selection: str = WEIGHTED):
+        """
+            [path] - Polyglot .bin file, only opened on the first lookup. A missing file is an empty book
+            [selection] - WEIGHTED or BEST, how getMove picks among the moves of a position
+        """
+        self.path = path
+        self.selection = selection
+        self.file = None
+        self.data = None
+        self.entryCount = None # Unknown until the file is opened
+
+    def open(self):
+        if self.entryCount != None: return
+        self.entryCount = 0
+        if not os.path.isfile(self.path):
+            print(f"Opening book {self.path} not found, playing without it")
+            return
+        self.file = open(self.path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        if size < ENTRY_SIZE: return # mmap cannot map an empty file
+        self.data = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+        self.entryCount = size // ENTRY_SIZE
+
+    def close(self):
+        if self.data != None: self.data.close()
+        if self.file != None: self.file.close()
+        self.file = None
+        self.data = None
+        self.entryCount = None
+
+    def readKey(self, index: int) -> int:
+        return struct.unpack_from(KEY_FORMAT, self.data, index * ENTRY_SIZE)[0]
+
+    def findFirstEntry(self, key: int) -> int:
+        """
+            Index of the first entry whose key is not below [key], entryCount if there is none
+        """
+        low, high = 0, self.entryCount
+        while low < high:
+            middle = (low + high) // 2
+            if self.readKey(middle) < key: low = middle + 1
+            else: high = middle
+        return low
+
+    def getEntries(self, gameState):
+        """
+            Returns the (packedMove, weight) entries of the position of [gameState], in the book order.
+            The packed moves carry no flag, see decodeMove
+        """
+        self.open()
+        key = getPolyglotKey(gameState)
+        entries = []
+        index = self.findFirstEntry(key)
+        while index < self.entryCount:
+            entryKey, bookMove, weight, _ = struct.unpack_from(ENTRY_FORMAT, self.data, index * ENTRY_SIZE)
+            if entryKey != key: break
+            entries.append((decodeMove(bookMove, gameState.board), weight))
+            index += 1
+        return entries
+
+    def getMove(self, gameState, validMoves):
+        """
+            Returns the Move of [validMoves] the book plays in the position of [gameState], None if it has none.
+            Entries that match no valid move (a corrupt book or an underpromotion) are skipped
+        """
+        movesByKey = {PackedMove.fromMove(move) & ~(PackedMove.FLAG_MASK << PackedMove.FLAG_SHIFT): move for move in validMoves}
+        candidates = [(movesByKey[move], weight) for move, weight in self.getEntries(gameState) if move in movesByKey and weight > 0]
+        if len(candidates) == 0: return None
+
+        if self.selection == self.BEST:
+            return max(candidates, key = lambda candidate: candidate[1])[0] # max keeps the first of equal weights
+        return random.choices([move for move, _ in candidates], weights = [weight for _, weight in candidates])[0]
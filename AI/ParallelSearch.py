@@ -0,0 +1,113 @@
+import time
+from multiprocessing import Pool
+import domain.chess.PackedMove as PackedMove
+from domain.chess.BitboardEngine import createGameState
+
+"""
+    Parallel root search
+
+    Splits the root moves of a position across a pool of worker processes. The first root move (the best one of the
+    previous depth) is searched alone with the full window, and its score becomes the alpha bound the other moves are
+    searched with in parallel. Each move is searched with a fresh A.I (empty transposition table, killer moves and history),
+    so its score only depends on the position, the move, the depth and that bound. The merge takes the highest score and
+    breaks ties by the root move order, so the chosen move does not depend on the number of workers or on which of them
+    finishes first. The pool is started once (see ChessAI.getPool) so the processes are not spawned again for each move,
+    but only the single process A.I keeps its tables warm between moves (see SearchWorker).
+    Unlike the serial search (ChessAI.searchRoot), a move does not benefit from the better bounds found by the moves searched
+    beside it, nor from their transposition table entries, so the workers visit more nodes than the serial search.
+"""
+_workerArguments = None # (aiClass, aiArguments, cancelEvent) of this worker process, set by the pool initializer
+
+def _initializeWorker(aiClass, aiArguments, cancelEvent):
+    global _workerArguments
+    _workerArguments = (aiClass, aiArguments, cancelEvent)
+
+def _searchRootMove(arguments):
+    return searchFreshRootMove(*_workerArguments, *arguments)
+
+def searchFreshRootMove(aiClass, aiArguments, cancelEvent, fen: str, move, depth: int, alpha, deadline: float = None):
+    """
+        Searches the packed root [move] of the position [fen] with a fresh A.I built from [aiClass] and [aiArguments],
+        see ChessAI.searchRootMove
+    """
+    ai = aiClass(**aiArguments)
+    ai.setCancelEvent(cancelEvent)
+    return ai.searchRootMove(createGameState(fen, ai.useBitboard), move, depth, alpha, deadline)
+
+def getSearchArguments(ai):
+    """
+        Returns the (aiClass, aiArguments, cancelEvent) of the A.Is searching the root moves of [ai],
+        which only search, so need neither a pool nor the opening book
+    """
+    return type(ai), {**ai.getArguments(), "workers": 1, "openingBookPath": None}, ai.cancelEvent
+
+def searchRootMoves(pool, ai, fen: str, rootMoves, depth: int, deadline: float = None):
+    """
+        Searches every Move of [rootMoves] in the position [fen] to [depth] plies, on [pool] (None to search them in this process),
+        with fresh A.Is built with the arguments of [ai] and stopped by its cancel event.
+        Returns (bestMove, score, nodes, principalVariation), or None if the [deadline] (a time.time() value)
+        passed or the search was cancelled first. A [pool] must be started with createPool from [ai]
+    """
+    searchArguments = getSearchArguments(ai)
+    firstResult = searchFreshRootMove(*searchArguments, fen, PackedMove.fromMove(rootMoves[0]), depth, -ai.INFINITE_SCORE, deadline)
+    if firstResult == None: return None
+    alpha, nodes, principalVariation = firstResult
+    best = (rootMoves[0], alpha, principalVariation)
+
+    # Scores not above alpha are only upper bounds, but those moves cannot be chosen anyway
+    tasks = [(fen, PackedMove.fromMove(move), depth, alpha, deadline) for move in rootMoves[1:]]
+    if pool != None: results = pool.map(_searchRootMove, tasks, chunksize = 1)
+    else: results = (searchFreshRootMove(*searchArguments, *task) for task in tasks)
+    for move, result in zip(rootMoves[1:], results):
+        if result == None: return None
+        score, moveNodes, principalVariation = result
+        nodes += moveNodes
+        # Strictly higher only, an equal score keeps the move ordered first
+        if score > best[1]: best = (move, score, principalVariation)
+    return best[0], best[1], nodes, best[2]
+
+def createPool(ai, workers: int):
+    """
+        Returns a Pool of [workers] processes searching with A.Is built with the arguments of [ai],
+        which stop when the cancel event of [ai] is set
+    """
+    return Pool(workers, initializer = _initializeWorker, initargs = getSearchArguments(ai))
+
+def parallelIterativeDeepening(ai, gameState, validMoves, workers: int, timeLimit: float = None, nodeLimit: int = None, maxDepth: int = None):
+    """
+        Same as ChessAI.iterativeDeepening, with every depth searched by searchRootMoves on the pool of [ai] (see ChessAI.getPool).
+        The [timeLimit] and the cancel event of [ai] are enforced inside the workers, the [nodeLimit] only between two depths.
+        Returns the best Move of the last completed depth, and leaves its line in ai.principalVariation
+    """
+    if len(validMoves) == 0: return None
+    startTime = time.time()
+    deadline = startTime + timeLimit if timeLimit != None else None
+    maxDepth = ai.MAX_SEARCH_DEPTH if maxDepth == None else maxDepth
+    fen = gameState.getFEN()
+    rootMoves = ai.orderRootMoves(gameState, validMoves)
+    bestMove = rootMoves[0]
+    principalVariation = [PackedMove.fromMove(bestMove)]
+    nodes = 0
+    pool = ai.getPool()
+
+    for depth in range(1, maxDepth + 1):
+        # Depth 1 always completes so there is a move to return
+        result = searchRootMoves(pool, ai, fen, rootMoves, depth, deadline if depth > 1 else None)
+        if result == None: break
+
+        bestMove, score, depthNodes, principalVariation = result
+        nodes += depthNodes
+        rootMoves.remove(bestMove)
+        rootMoves.insert(0, bestMove)
+        ai.lastScore = score
+        print(f"depth {depth}: {bestMove.getChessNotation()} score = {ai.formatScore(score)}, nodes = {nodes}, "
+              f"time = {time.time() - startTime:.2f}s, pv = {' '.join(PackedMove.toString(move) for move in principalVariation)}")
+
+        if ai.isMateFound(score, depth) or ai.isCancelled(): break
+        if nodeLimit != None and nodes >= nodeLimit: break
+        if timeLimit != None and time.time() - startTime > timeLimit / 2: break
+
+    print(f"number of counts = {nodes} on {workers} workers")
+    ai.principalVariation = principalVariation
+    ai.lastSearchNodes = nodes
+    return bestMove
@@ -0,0 +1,58 @@
+from AI.PawnStructure import getPawnMasks, evaluatePawnStructure
+
+"""
+    Pawn hash table used by the evaluation to reuse the pawn structure terms of the pawn structures it has already seen.
+
+    Entries are (key, middlegameScore, endgameScore, whitePassedPawns, blackPassedPawns) tuples, where the key is
+    GameState.pawnKey (see Zobrist.computePawnKey). Pawns move far less often than the other pieces, so most leaves of a
+    search share the pawn structure of another one and are answered without looking at the pawns.
+    A slot holds one entry and is always replaced, the latest pawn structures being the ones the search comes back to.
+"""
+# Rough size of one entry (tuple, key, scores and masks plus the list slot) to turn a memory budget into a slot count
+ENTRY_SIZE_BYTES = 200
+
+class PawnHashTable:
+    def __init__(self, sizeMB: float = 2):
+        """
+            [sizeMB] - memory budget, the slot count is the largest power of two that fits in it
+        """
+        slotCount = 1
+        while slotCount * 2 * ENTRY_SIZE_BYTES <= sizeMB * 1024 * 1024:
+            slotCount *= 2
+        self.slotMask = slotCount - 1
+        self.entries = [None] * slotCount
+        self.resetStatistics()
+
+    def probe(self, gameState):
+        """
+            Returns the entry of the pawn structure of [gameState], evaluating and storing it if it is not in the table
+        """
+        key = gameState.pawnKey
+        index = key & self.slotMask
+        entry = self.entries[index]
+        if entry != None and entry[0] == key:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        entry = (key, *evaluatePawnStructure(*getPawnMasks(gameState)))
+        self.entries[index] = entry
+        return entry
+
+    def clear(self):
+        self.entries = [None] * len(self.entries)
+        self.resetStatistics()
+
+    """
+        Statistics
+    """
+    def resetStatistics(self):
+        self.hits = 0
+        self.misses = 0
+
+    def hitRate(self) -> float:
+        probes = self.hits + self.misses
+        return self.hits / probes if probes > 0 else 0.0
+
+    def getStatistics(self):
+        used = sum(1 for entry in self.entries if entry != None)
+        return {"hits": self.hits, "misses": self.misses, "hitRate": self.hitRate(), "used": used, "capacity": len(self.entries)}
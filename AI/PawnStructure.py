@@ -0,0 +1,72 @@
+"""
+    Pawn structure terms of the evaluation
+
+    Pawns are given as 64-bit masks (bit row * 8 + col, matching GameState.board). The terms only depend on the pawns,
+    so the search caches them per pawn structure in a PawnHashTable instead of computing them at every leaf.
+    Scores are (middlegame, endgame) pairs from white's side, blended by the game phase like the square scores (see taperScore)
+"""
+FILE_MASKS = [sum(1 << (row * 8 + col) for row in range(8)) for col in range(8)]
+ADJACENT_FILE_MASKS = [(FILE_MASKS[col - 1] if col > 0 else 0) | (FILE_MASKS[col + 1] if col < 7 else 0) for col in range(8)]
+
+def createPassedPawnMask(color: str, square: int) -> int:
+    """
+        Squares in front of a [color] pawn on [square], on its file and the adjacent ones.
+        The pawn is passed when no enemy pawn stands on them
+    """
+    row, col = square >> 3, square & 7
+    rows = range(row) if color == "w" else range(row + 1, 8)
+    return sum(1 << (frontRow * 8 + frontCol) for frontRow in rows for frontCol in range(max(col - 1, 0), min(col + 2, 8)))
+
+PASSED_PAWN_MASKS = {color: [createPassedPawnMask(color, square) for square in range(64)] for color in ["w", "b"]}
+
+# Per pawn, (middlegame, endgame)
+DOUBLED_PAWN_PENALTY = (-1.0, -2.0) # Every pawn of a file but one
+ISOLATED_PAWN_PENALTY = (-1.5, -1.0) # No pawn of the same color on the adjacent files
+
+# By the number of rows the pawn has advanced, from 0 (own back rank) to 7
+PASSED_PAWN_BONUS = ([0.0, 0.0, 0.5, 1.0, 1.5, 2.5, 4.0, 0.0], [0.0, 0.5, 1.0, 2.0, 3.0, 5.0, 7.0, 0.0])
+
+def getPawnMasks(gameState):
+    """
+        Returns the (white, black) pawn masks of [gameState]
+    """
+    board = gameState.board
+    masks = {"w": 0, "b": 0}
+    for color, squares in gameState.pieceSquares.items():
+        for square in squares:
+            if board[square >> 3][square & 7][1] == "P": masks[color] |= 1 << square
+    return masks["w"], masks["b"]
+
+def evaluateColorPawns(color: str, pawns: int, enemyPawns: int):
+    """
+        Returns the (middlegameScore, endgameScore, passedPawns) of the [pawns] of [color] facing [enemyPawns]
+    """
+    middlegameScore, endgameScore, passedPawns = 0.0, 0.0, 0
+    for col in range(8):
+        filePawns = bin(pawns & FILE_MASKS[col]).count("1")
+        if filePawns == 0: continue
+        middlegameScore += (filePawns - 1) * DOUBLED_PAWN_PENALTY[0]
+        endgameScore += (filePawns - 1) * DOUBLED_PAWN_PENALTY[1]
+        if pawns & ADJACENT_FILE_MASKS[col] == 0:
+            middlegameScore += filePawns * ISOLATED_PAWN_PENALTY[0]
+            endgameScore += filePawns * ISOLATED_PAWN_PENALTY[1]
+
+    remaining = pawns
+    while remaining:
+        bit = remaining & -remaining
+        remaining ^= bit
+        square = bit.bit_length() - 1
+        if enemyPawns & PASSED_PAWN_MASKS[color][square]: continue
+        passedPawns |= bit
+        advance = 7 - (square >> 3) if color == "w" else square >> 3
+        middlegameScore += PASSED_PAWN_BONUS[0][advance]
+        endgameScore += PASSED_PAWN_BONUS[1][advance]
+    return middlegameScore, endgameScore, passedPawns
+
+def evaluatePawnStructure(whitePawns: int, blackPawns: int):
+    """
+        Returns (middlegameScore, endgameScore, whitePassedPawns, blackPassedPawns), scores from white's side
+    """
+    whiteMiddlegame, whiteEndgame, whitePassedPawns = evaluateColorPawns("w", whitePawns, blackPawns)
+    blackMiddlegame, blackEndgame, blackPassedPawns = evaluateColorPawns("b", blackPawns, whitePawns)
+    return whiteMiddlegame - blackMiddlegame, whiteEndgame - blackEndgame, whitePassedPawns, blackPassedPawns
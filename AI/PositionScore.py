@@ -70,9 +70,70 @@ king = np.array([
 
 SCORE_DICT = {"P": pawn, "R": rook, "N": knight, "B": bishop, "Q": queen, "K": king}
 
-def positionScore(piece):
-    # validPieces = ["P", "R", "N", "B", "Q", "K"]
-    # if piece not in validPieces: return 0
-    result = SCORE_DICT[piece[1]]
-    return result if piece[0] == "w" else np.flip(result) * (-1)
-    # return result if piece[0] == "w" else np.flip(result) * (-1) if piece[0] == "b" else None
\ No newline at end of file
+"""
+    Endgame tables, the king heads for the centre and the pawns for promotion.
+    The other pieces keep their middlegame table
+"""
+pawnEndgame = np.array([
+    [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
+    [8.0, 8.0, 8.0, 8.0, 8.0, 8.0, 8.0, 8.0],
+    [5.0, 5.0, 5.0, 5.0, 5.0, 5.0, 5.0, 5.0],
+    [3.0, 3.0, 3.0, 3.0, 3.0, 3.0, 3.0, 3.0],
+    [1.5, 1.5, 1.5, 1.5, 1.5, 1.5, 1.5, 1.5],
+    [0.5, 0.5, 0.5, 0.5, 0.5, 0.5, 0.5, 0.5],
+    [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
+    [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0]
+])
+
+kingEndgame = np.array([
+    [-5.0, -4.0, -3.0, -2.0, -2.0, -3.0, -4.0, -5.0],
+    [-3.0, -2.0, -1.0, 0.0, 0.0, -1.0, -2.0, -3.0],
+    [-3.0, -1.0, 2.0, 3.0, 3.0, 2.0, -1.0, -3.0],
+    [-3.0, -1.0, 3.0, 4.0, 4.0, 3.0, -1.0, -3.0],
+    [-3.0, -1.0, 3.0, 4.0, 4.0, 3.0, -1.0, -3.0],
+    [-3.0, -1.0, 2.0, 3.0, 3.0, 2.0, -1.0, -3.0],
+    [-3.0, -3.0, 0.0, 0.0, 0.0, 0.0, -3.0, -3.0],
+    [-5.0, -3.0, -3.0, -3.0, -3.0, -3.0, -3.0, -5.0]
+])
+
+ENDGAME_SCORE_DICT = {**SCORE_DICT, "P": pawnEndgame, "K": kingEndgame}
+
+"""
+    Flat tables, built once at import
+
+    One list of 64 scores (square = row * 8 + col) per piece and colour, with the material folded in, for the middlegame
+    and for the endgame. The tables above are from white's side, black's are mirrored vertically. Scores count for the
+    side owning the piece, so the evaluation is white's sum minus black's, blended by the game phase (see taperScore)
+"""
+PIECES = ["wP", "wN", "wB", "wR", "wQ", "wK", "bP", "bN", "bB", "bR", "bQ", "bK"]
+
+MIDDLEGAME_MATERIAL = {"P": 10, "N": 30, "B": 30, "R": 50, "Q": 90, "K": 0}
+ENDGAME_MATERIAL = {"P": 12, "N": 30, "B": 30, "R": 50, "Q": 90, "K": 0}
+
+# Phase of each piece, the phase of a position being the sum over its pieces, capped at TOTAL_PHASE
+PHASE_WEIGHTS = {"P": 0, "N": 1, "B": 1, "R": 2, "Q": 4, "K": 0}
+TOTAL_PHASE = 24 # Every minor and major piece on the board, full middlegame
+
+SCORE_STEP = 0.5 # Scores are rounded to the step of the tables, which the search relies on (see ChessAI.NULL_WINDOW)
+
+def createFlatTable(tables, material, piece):
+    table = tables[piece[1]]
+    rows = range(8) if piece[0] == "w" else range(7, -1, -1)
+    return [material[piece[1]] + float(table[row][col]) for row in rows for col in range(8)]
+
+MIDDLEGAME_TABLES = {piece: createFlatTable(SCORE_DICT, MIDDLEGAME_MATERIAL, piece) for piece in PIECES}
+ENDGAME_TABLES = {piece: createFlatTable(ENDGAME_SCORE_DICT, ENDGAME_MATERIAL, piece) for piece in PIECES}
+PHASE_TABLES = {piece: [PHASE_WEIGHTS[piece[1]]] * 64 for piece in PIECES}
+
+# Tables of GameState.setSquareScoreTables, read back by index
+SQUARE_SCORE_TABLES = (MIDDLEGAME_TABLES, ENDGAME_TABLES, PHASE_TABLES)
+MIDDLEGAME, ENDGAME, PHASE = range(3)
+
+def taperScore(middlegameScore, endgameScore, phase):
+    """
+        Blends the middlegame and endgame scores by [phase], from TOTAL_PHASE (middlegame only) down to 0 (endgame only),
+        rounded to SCORE_STEP
+    """
+    phase = min(phase, TOTAL_PHASE)
+    score = (middlegameScore * phase + endgameScore * (TOTAL_PHASE - phase)) / TOTAL_PHASE
+    return round(score / SCORE_STEP) * SCORE_STEP
@@ -0,0 +1,128 @@
+import atexit
+import queue
+from multiprocessing import Process, Queue, Event
+from AI.ChessAI import ChessAI
+from domain.chess.ChessEngine import GameState
+from domain.chess.BitboardEngine import BitboardGameState
+import domain.chess.PackedMove as PackedMove
+
+"""
+    Persistent A.I worker
+
+    Runs one ChessAI in a process that is started once and kept alive between moves, so its transposition table and
+    move ordering tables stay warm and no process is spawned per move. A parallel A.I keeps its pool of processes
+    (see ChessAI.getPool) in the worker as well, until stop. Only the FEN of the position goes to the worker,
+    and only the packed move, its principal variation and its score come back, instead of pickling the whole GameState.
+    Requests are numbered, so the answer of an abandoned request (after an undo or a reset) is recognised and dropped.
+    A shared event stops the search in progress (see ChessAI.setCancelEvent), which then answers with its best move so far.
+"""
+def _run(requests, results, cancelEvent, aiArguments):
+    ai = ChessAI(**aiArguments)
+    ai.setCancelEvent(cancelEvent)
+    gameState = BitboardGameState() if aiArguments.get("useBitboard", False) else GameState()
+    try:
+        while True:
+            request = requests.get()
+            # Requests queued behind others were sent after abandoning them, only the last one is answered
+            while request != None:
+                try: request = requests.get(block = False)
+                except queue.Empty: break
+            if request == None: break # Stop
+            requestId, fen, timeLimit, nodeLimit = request
+            # A new request is only sent once the previous one is answered or abandoned, so the event concerns an older one
+            cancelEvent.clear()
+            gameState.loadFEN(fen)
+            move = ai.generateMove(gameState, gameState.getAllValidMoves(gameState.whiteTurn), timeLimit, nodeLimit)
+            results.put((requestId, PackedMove.fromMove(move) if move != None else None, ai.getPrincipalVariation(), ai.lastScore))
+    finally:
+        ai.close() # The pool of a parallel A.I (see ChessAI.getPool)
+
+class SearchWorker:
+    STOP_TIMEOUT = 5 # Seconds stop waits for the worker to finish its search before terminating it
+
+    def __init__(self, aiArguments = None):
+        """
+            [aiArguments] - ChessAI keyword arguments of the worker's A.I
+        """
+        self.aiArguments = {} if aiArguments == None else aiArguments
+        self.process = None
+        self.requests = None
+        self.results = None
+        self.cancelEvent = None
+        self.requestId = 0
+        self.pendingRequestId = None # Request whose answer is awaited, None when idle
+
+    def start(self):
+        """
+            Starts the worker process, requestMove does it on its first call
+        """
+        if self.isAlive(): return
+        self.requests = Queue()
+        self.results = Queue()
+        self.cancelEvent = Event()
+        # Not a daemon, so that its A.I may start a pool of its own (see ParallelSearch)
+        self.process = Process(target = _run, args = (self.requests, self.results, self.cancelEvent, self.aiArguments))
+        self.process.start()
+        atexit.register(self.stop)
+
+    def isAlive(self) -> bool:
+        return self.process != None and self.process.is_alive()
+
+    def isSearching(self) -> bool:
+        return self.pendingRequestId != None
+
+    def requestMove(self, gameState, timeLimit = None, nodeLimit = None):
+        """
+            Asks the worker for a move in the position of [gameState], with the budget of ChessAI.generateMove.
+            Returns straight away, the move is collected with pollMove
+        """
+        self.start()
+        self.requestId += 1
+        self.pendingRequestId = self.requestId
+        self.requests.put((self.requestId, gameState.getFEN(), timeLimit, nodeLimit))
+
+    def pollMove(self, gameState):
+        """
+            Returns (move, principalVariation, score) once the pending request is answered, None until then.
+            [gameState] - the position the move was requested for, the move returned is one of its valid Move objects.
+            The score is from the point of view of the side to move in [gameState], None for a book move (see ChessAI.lastScore)
+        """
+        while self.pendingRequestId != None:
+            try: requestId, packedMove, principalVariation, score = self.results.get(block = False)
+            except queue.Empty: return None
+            if requestId != self.pendingRequestId: continue # Answer of an abandoned request
+            self.pendingRequestId = None
+            return self.findMove(gameState, packedMove), principalVariation, score
+        return None
+
+    def findMove(self, gameState, packedMove):
+        for move in gameState.getAllValidMoves(gameState.whiteTurn):
+            if PackedMove.fromMove(move) == packedMove: return move
+        return None
+
+    def interrupt(self):
+        """
+            Stops the pending search early, pollMove then returns its best move so far
+        """
+        if self.pendingRequestId != None: self.cancelEvent.set()
+
+    def abandon(self):
+        """
+            Stops the pending search and forgets it, its answer is dropped when it arrives
+        """
+        self.interrupt()
+        self.pendingRequestId = None
+
+    def stop(self):
+        """
+            Stops the search in progress and the worker process, along with the pool of a parallel A.I
+        """
+        if self.process == None: return
+        if self.process.is_alive():
+            self.cancelEvent.set()
+            self.requests.put(None)
+            self.process.join(self.STOP_TIMEOUT)
+            if self.process.is_alive(): self.process.terminate()
+        self.process = None
+        self.pendingRequestId = None
+        atexit.unregister(self.stop)
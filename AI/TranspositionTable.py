@@ -0,0 +1,77 @@
+"""
+    Transposition table used by the search to reuse the results of positions it has already searched.
+
+    Entries are (key, depth, score, bound, bestMove) tuples, where the key is GameState.zobristKey, the score is
+    from the point of view of the side to move and bound tells whether the score is exact or only a bound.
+    Mate scores are stored counted from the entry's position rather than from the root (see ChessAI.scoreToTable).
+    The table is split into buckets of two slots:
+        slot 0 - depth-preferred, only replaced by a search at least as deep (or of the same position)
+        slot 1 - always replaced, so recent positions are kept even when the first slot holds a deeper one
+"""
+EXACT = 0
+LOWER_BOUND = 1 # Score failed high, the true score is at least this
+UPPER_BOUND = 2 # Score failed low, the true score is at most this
+
+# Rough size of one entry (tuple, key, score and move objects plus the list slot) to turn a memory budget into a slot count
+ENTRY_SIZE_BYTES = 176
+
+class TranspositionTable:
+    def __init__(self, sizeMB: float = 32):
+        """
+            [sizeMB] - memory budget, the bucket count is the largest power of two that fits in it
+        """
+        bucketCount = 1
+        while bucketCount * 4 * ENTRY_SIZE_BYTES <= sizeMB * 1024 * 1024:
+            bucketCount *= 2
+        self.bucketMask = bucketCount - 1
+        self.entries = [None] * (bucketCount * 2)
+        self.resetStatistics()
+
+    def probe(self, key: int):
+        """
+            Returns the (key, depth, score, bound, bestMove) entry of [key], or None if the position is not stored
+        """
+        self.probes += 1
+        index = (key & self.bucketMask) * 2
+        entry = self.entries[index]
+        if entry != None and entry[0] == key:
+            self.hits += 1
+            return entry
+        entry = self.entries[index + 1]
+        if entry != None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key: int, depth: int, score, bound: int, bestMove: int):
+        self.stores += 1
+        index = (key & self.bucketMask) * 2
+        entry = (key, depth, score, bound, bestMove)
+        deepEntry = self.entries[index]
+        if deepEntry == None or deepEntry[0] == key or depth >= deepEntry[1]:
+            self.entries[index] = entry
+            # Keep the replaced entry of another position in the always-replace slot
+            if deepEntry != None and deepEntry[0] != key: self.entries[index + 1] = deepEntry
+            elif self.entries[index + 1] != None and self.entries[index + 1][0] == key: self.entries[index + 1] = None
+        else:
+            self.entries[index + 1] = entry
+
+    def clear(self):
+        self.entries = [None] * len(self.entries)
+        self.resetStatistics()
+
+    """
+        Statistics
+    """
+    def resetStatistics(self):
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def hitRate(self) -> float:
+        return self.hits / self.probes if self.probes > 0 else 0.0
+
+    def getStatistics(self):
+        used = sum(1 for entry in self.entries if entry != None)
+        return {"probes": self.probes, "hits": self.hits, "hitRate": self.hitRate(), "stores": self.stores,
+                "used": used, "capacity": len(self.entries)}
@@ -0,0 +1,43 @@
+import argparse
+from AI.Benchmark import CONFIGURATIONS, runBenchmark, printResults, runParallelBenchmark, printSpeedup, runEvaluationBenchmark, runIncrementalBenchmark
+
+"""
+    Search benchmark command line tool
+
+    python benchmark.py -d 4
+    python benchmark.py -d 3 --configuration ordered --bitboard
+    python benchmark.py -d 4 --configuration quiescence --configuration pvs --iterative
+    python benchmark.py -d 4 --workers 1 2 4
+    python benchmark.py --evaluation 10000
+    python benchmark.py --incremental 10000
+"""
+def parseArguments():
+    parser = argparse.ArgumentParser(description = "Compare the nodes and time of the A.I search across configurations")
+    parser.add_argument("-d", "--depth", type = int, default = 3, help = "number of plies to search")
+    parser.add_argument("--configuration", action = "append", choices = list(CONFIGURATIONS), help = "configuration to run, repeatable (default: all)")
+    parser.add_argument("--bitboard", action = "store_true", help = "use BitboardGameState instead of GameState")
+    parser.add_argument("--workers", type = int, nargs = "+", help = "compare the parallel root search on these worker counts instead")
+    parser.add_argument("--iterative", action = "store_true", help = "deepen iteratively up to the depth, with aspiration windows")
+    parser.add_argument("--evaluation", type = int, metavar = "N", help = "compare the scalar and batch evaluation of N random positions instead")
+    parser.add_argument("--incremental", type = int, metavar = "N", help = "check the incremental evaluation against a full recompute "
+                        "after N random moves and undos on each engine instead")
+    return parser.parse_args()
+
+def main():
+    arguments = parseArguments()
+    if arguments.evaluation != None:
+        runEvaluationBenchmark(arguments.evaluation)
+        return
+    if arguments.incremental != None:
+        runIncrementalBenchmark(arguments.incremental)
+        return
+    if arguments.workers != None:
+        results = runParallelBenchmark(arguments.depth, arguments.workers, useBitboard = arguments.bitboard)
+        printResults(results)
+        printSpeedup(results)
+        return
+    names = arguments.configuration if arguments.configuration != None else list(CONFIGURATIONS)
+    printResults(runBenchmark(arguments.depth, {name: CONFIGURATIONS[name] for name in names}, useBitboard = arguments.bitboard, iterative = arguments.iterative))
+
+if __name__ == "__main__":
+    main()
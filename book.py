@@ -0,0 +1,62 @@
+import argparse
+import sys
+from AI.OpeningBook import OpeningBook, REFERENCE_KEYS, getPolyglotKey
+from domain.chess.BitboardEngine import createGameState
+import domain.chess.PackedMove as PackedMove
+from settings import AI_OPENING_BOOK
+
+"""
+    Opening book command line tool
+
+    python book.py                                  -> checks the Polyglot keys and the lookups of the bundled book
+    python book.py --fen "<fen>"                    -> lists the book moves of a position
+    python book.py --book other.bin --fen "<fen>"
+"""
+# (name, fen, (move, weight) entries in the book order) of the bundled book.
+# The Ruy Lopez castling is stored as the king taking its rook (e1h1) and must come out as the castle e1g1
+BUNDLED_BOOK_ENTRIES = [
+    ("startpos", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", [("e2e4", 110), ("d2d4", 65), ("c2c4", 8), ("g1f3", 6)]),
+    ("ruy lopez", "r1bqkb1r/1ppp1ppp/p1n2n2/4p3/B3P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 5", [("e1g1", 30)]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", []),
+]
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description = "Check the Polyglot opening book or list the book moves of a position")
+    parser.add_argument("--book", default = AI_OPENING_BOOK, help = "Polyglot .bin book (default: the bundled one)")
+    parser.add_argument("--fen", help = "list the book moves of this position instead of running the checks")
+    parser.add_argument("--bitboard", action = "store_true", help = "use BitboardGameState instead of GameState")
+    return parser.parse_args()
+
+def printCheck(name: str, actual, expected) -> bool:
+    verdict = "ok" if actual == expected else f"MISMATCH (expected {expected})"
+    print(f"{name:<32}{str(actual):<64}{verdict}")
+    return actual == expected
+
+def main():
+    arguments = parseArguments()
+    book = OpeningBook(arguments.book, OpeningBook.BEST)
+    if arguments.fen != None:
+        for move, weight in book.getEntries(createGameState(arguments.fen, arguments.bitboard)):
+            print(f"{PackedMove.toString(move)}: {weight}")
+        return
+
+    passed = True
+    for name, fen, key in REFERENCE_KEYS:
+        passed &= printCheck(name, f"{getPolyglotKey(createGameState(fen, arguments.bitboard)):016x}", f"{key:016x}")
+
+    # Only the bundled book holds these entries
+    for name, fen, expectedEntries in BUNDLED_BOOK_ENTRIES if arguments.book == AI_OPENING_BOOK else []:
+        gameState = createGameState(fen, arguments.bitboard)
+        entries = [(PackedMove.toString(move), weight) for move, weight in book.getEntries(gameState)]
+        passed &= printCheck(f"{name} entries", entries, expectedEntries)
+        # The book move must be one of the valid moves, flag included (a castle for the Ruy Lopez)
+        move = book.getMove(gameState, gameState.getAllValidMoves(gameState.whiteTurn))
+        bestMove = expectedEntries[0][0] if len(expectedEntries) > 0 else None
+        passed &= printCheck(f"{name} move", PackedMove.toString(PackedMove.fromMove(move)) if move != None else None, bestMove)
+    book.close()
+
+    # A non-zero exit code lets scripts use the checks as a regression test
+    sys.exit(0 if passed else 1)
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,7 @@ from selenium.common.exceptions import TimeoutException
 from typing import Protocol
 from AI.ChessAI import ChessAI
 from domain.chess.ChessEngine import GameState
+from domain.chess.CastleRights import CastleRights
 from domain.chess.Move import Move
 
 from bot.PageLocators import PageLocators
@@ -36,14 +37,22 @@ customPiece_to_webPiece = {v: k for k, v in webPiece_to_customPiece.items()}
 class AiBot(Protocol):
     def generatemove(*args, **kwargs) -> Move:
         ...
+
+    def getPrincipalVariation(self) -> list[str]:
+        ...
         
 class ChessAutomation:
     """
     Automates a chess bot battle on chess.com
     """
-    def __init__(self, driver: WebDriver, ai: AiBot) -> None:
+    def __init__(self, driver: WebDriver, ai: AiBot, moveTimeLimit: float = None) -> None:
+        """
+        [moveTimeLimit] - seconds the [ai] may think per move, None to let it search its fixed depth
+        """
         self.driver = driver
         self.ai = ai
+        self.moveTimeLimit = moveTimeLimit
+        self.castleRights = CastleRights() # Narrowed on every board read, the website does not show them
         
         url = "https://www.chess.com/play/computer"
         driver.get(url)
@@ -247,13 +256,14 @@ class ChessAutomation:
         """
             Generate a Move Object based on the given [board] and [ai] engine
         """
+        self.castleRights.updateFromBoard(board)
         gameState = GameState()
-        gameState.board = board
-        gameState.whiteTurn = True
+        gameState.loadBoard(board, whiteTurn = True, castleRights = self.castleRights)
         
-        move_obj = self.ai.generateMove(gameState, gameState.getAllValidMoves(True))
+        move_obj = self.ai.generateMove(gameState, gameState.getAllValidMoves(True), timeLimit = self.moveTimeLimit)
         
         print(f"Moving {move_obj.pieceMoved} from {move_obj.startRow}{move_obj.startCol} to {move_obj.endRow}{move_obj.endCol}")
+        print("Expected line: " + " ".join(self.ai.getPrincipalVariation()))
         return move_obj
 
     """
@@ -15,9 +15,11 @@ from selenium.webdriver.chrome.service import Service
 
 from AI.ChessAI import ChessAI
 from domain.chess.ChessEngine import GameState
+from domain.chess.CastleRights import CastleRights
 from domain.chess.Move import Move
 
 from bot.PageLocators import PageLocators
+from settings import AI_MOVE_TIME_LIMIT
 webPiece_to_customPiece = {
     "bp": "bP",
     "br": "bR", 
@@ -36,6 +38,7 @@ customPiece_to_webPiece = {v: k for k, v in webPiece_to_customPiece.items()}
 
 def main():
     ai = ChessAI()
+    castleRights = CastleRights() # Narrowed on every board read, the website does not show them
     driver = setUpDriver()
     
     removeInitialPopUp(driver)
@@ -45,7 +48,7 @@ def main():
         beautify(board)
 
         print("generating  AI move ...")
-        moveObj = generateAIMove(board, ai)
+        moveObj = generateAIMove(board, ai, castleRights, AI_MOVE_TIME_LIMIT)
         
         print("Applying Move")
         applyMoveToWebsite(driver, moveObj)
@@ -245,17 +248,19 @@ def getHighlightPosition(highlightElement: WebElement):
 """
     A.I Move    
 """
-def generateAIMove(board: list[list[str]], ai: ChessAI) -> Move:
+def generateAIMove(board: list[list[str]], ai: ChessAI, castleRights: CastleRights, timeLimit: float = None) -> Move:
     """
-        Generate a Move Object based on the given [board] and [ai] engine
+        Generate a Move Object based on the given [board] and [ai] engine, thinking for at most [timeLimit] seconds.
+        [castleRights] - rights kept across the turns of the game, narrowed with [board]
     """
+    castleRights.updateFromBoard(board)
     gameState = GameState()
-    gameState.board = board
-    gameState.whiteTurn = True
+    gameState.loadBoard(board, whiteTurn = True, castleRights = castleRights)
     
-    move_obj = ai.generateMove(gameState, gameState.getAllValidMoves(True))
+    move_obj = ai.generateMove(gameState, gameState.getAllValidMoves(True), timeLimit = timeLimit)
     
     print(f"Moving {move_obj.pieceMoved} from {move_obj.startRow}{move_obj.startCol} to {move_obj.endRow}{move_obj.endCol}")
+    print("Expected line: " + " ".join(ai.getPrincipalVariation()))
     return move_obj
 
 """
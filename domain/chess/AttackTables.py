@@ -0,0 +1,94 @@
+"""
+    Attack and ray tables, built once at import.
+
+    Squares are indexed as row * 8 + col (a8 = 0, h1 = 63), the same layout as GameState.board,
+    so a square's row is square >> 3 and its column square & 7.
+
+    Square list tables (used by the mailbox move generators, attack detection and evaluation):
+        KNIGHT_TARGETS[sq], KING_TARGETS[sq]  - squares a knight / king on sq moves to
+        PAWN_PUSHES[color][sq]                - single push square, followed by the double push square on the starting row
+        PAWN_CAPTURES[color][sq]              - squares a pawn of [color] on sq captures on
+        RAYS[direction][sq]                   - squares along DIRECTIONS[direction], nearest first
+
+    Bitboard tables (bit i set for square i, used by BitboardGameState):
+        KNIGHT_ATTACKS[sq], KING_ATTACKS[sq], PAWN_ATTACKS[color][sq] and the sliding ray masks
+"""
+DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)) #up, down, left, right, up-left, up-right, down-left, down-right
+ROOK_DIRECTIONS = (0, 1, 2, 3)
+BISHOP_DIRECTIONS = (4, 5, 6, 7)
+QUEEN_DIRECTIONS = ROOK_DIRECTIONS + BISHOP_DIRECTIONS
+
+KNIGHT_OFFSETS = ((1, -2), (-1, -2), (2, -1), (-2, -1), (2, 1), (-2, 1), (1, 2), (-1, 2))
+KING_OFFSETS = DIRECTIONS
+
+# Row direction in which pawns of each color move
+PAWN_DIRECTION = {"w": -1, "b": 1}
+PAWN_START_ROW = {"w": 6, "b": 1}
+PAWN_PROMOTION_ROW = {"w": 0, "b": 7}
+
+def _offsetTargets(offsets):
+    table = []
+    for sq in range(64):
+        row, col = divmod(sq, 8)
+        table.append(tuple((row + dRow) * 8 + col + dCol for dRow, dCol in offsets
+                           if 0 <= row + dRow <= 7 and 0 <= col + dCol <= 7))
+    return table
+
+def _rayTargets(dRow, dCol):
+    table = []
+    for sq in range(64):
+        row, col = divmod(sq, 8)
+        ray = []
+        endRow, endCol = row + dRow, col + dCol
+        while 0 <= endRow <= 7 and 0 <= endCol <= 7:
+            ray.append(endRow * 8 + endCol)
+            endRow, endCol = endRow + dRow, endCol + dCol
+        table.append(tuple(ray))
+    return table
+
+def _pawnPushes(color):
+    table = []
+    for sq in range(64):
+        row, col = divmod(sq, 8)
+        endRow = row + PAWN_DIRECTION[color]
+        if row == PAWN_PROMOTION_ROW[color] or not 0 <= endRow <= 7: table.append(())
+        elif row == PAWN_START_ROW[color]: table.append((endRow * 8 + col, (endRow + PAWN_DIRECTION[color]) * 8 + col))
+        else: table.append((endRow * 8 + col,))
+    return table
+
+def _toMasks(table):
+    masks = []
+    for targets in table:
+        mask = 0
+        for target in targets: mask |= 1 << target
+        masks.append(mask)
+    return masks
+
+"""
+    Square list tables
+"""
+KNIGHT_TARGETS = _offsetTargets(KNIGHT_OFFSETS)
+KING_TARGETS = _offsetTargets(KING_OFFSETS)
+PAWN_PUSHES = {"w": _pawnPushes("w"), "b": _pawnPushes("b")}
+PAWN_CAPTURES = {
+    "w": _offsetTargets(((-1, -1), (-1, 1))),
+    "b": _offsetTargets(((1, -1), (1, 1))),
+}
+RAYS = [_rayTargets(dRow, dCol) for dRow, dCol in DIRECTIONS]
+
+"""
+    Bitboard tables
+"""
+KNIGHT_ATTACKS = _toMasks(KNIGHT_TARGETS)
+KING_ATTACKS = _toMasks(KING_TARGETS)
+PAWN_ATTACKS = {color: _toMasks(table) for color, table in PAWN_CAPTURES.items()}
+RAY_MASKS = [_toMasks(table) for table in RAYS]
+
+# Sliding rays split by whether the square index increases along the ray.
+# For an increasing ray the nearest blocker is the lowest set bit, otherwise the highest set bit
+ROOK_RAYS_POSITIVE = [RAY_MASKS[1], RAY_MASKS[3]] #down, right
+ROOK_RAYS_NEGATIVE = [RAY_MASKS[0], RAY_MASKS[2]] #up, left
+BISHOP_RAYS_POSITIVE = [RAY_MASKS[6], RAY_MASKS[7]] #down-left, down-right
+BISHOP_RAYS_NEGATIVE = [RAY_MASKS[4], RAY_MASKS[5]] #up-left, up-right
+
+ROW_MASKS = [0xFF << (8 * row) for row in range(8)]
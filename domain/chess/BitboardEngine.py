@@ -0,0 +1,205 @@
+from domain.chess.ChessEngine import GameState
+from domain.chess.Piece import King
+import domain.chess.PackedMove as PackedMove
+from domain.chess.AttackTables import KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, ROW_MASKS,\
+    ROOK_RAYS_POSITIVE, ROOK_RAYS_NEGATIVE, BISHOP_RAYS_POSITIVE, BISHOP_RAYS_NEGATIVE
+
+"""
+    Bitboard tables
+
+    Squares are indexed as row * 8 + col, i.e. a8 = 0, h8 = 7, a1 = 56 and h1 = 63, which is the same
+    layout as GameState.board. Bit i of a bitboard is set when square i is occupied.
+    The attack masks themselves live in AttackTables, shared with the mailbox generators.
+"""
+PIECES = ["wP", "wN", "wB", "wR", "wQ", "wK", "bP", "bN", "bB", "bR", "bQ", "bK"]
+
+FULL_BOARD = (1 << 64) - 1
+
+def slidingAttacks(sq: int, occupied: int, positiveRays, negativeRays) -> int:
+    """
+        Returns the attack set of a slider on [sq], stopping each ray at (and including) its first blocker
+    """
+    attacks = 0
+    for rays in positiveRays:
+        ray = rays[sq]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= rays[(blockers & -blockers).bit_length() - 1]
+        attacks |= ray
+    for rays in negativeRays:
+        ray = rays[sq]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= rays[blockers.bit_length() - 1]
+        attacks |= ray
+    return attacks
+
+def rookAttacks(sq: int, occupied: int) -> int:
+    return slidingAttacks(sq, occupied, ROOK_RAYS_POSITIVE, ROOK_RAYS_NEGATIVE)
+
+def bishopAttacks(sq: int, occupied: int) -> int:
+    return slidingAttacks(sq, occupied, BISHOP_RAYS_POSITIVE, BISHOP_RAYS_NEGATIVE)
+
+def iterateBits(bitboard: int):
+    """
+        Yields the square index of every set bit, lowest first
+    """
+    while bitboard:
+        lowest = bitboard & -bitboard
+        yield lowest.bit_length() - 1
+        bitboard ^= lowest
+
+
+class BitboardGameState(GameState):
+    """
+        GameState that additionally keeps the position as twelve piece bitboards plus occupancy masks.
+        The board is kept as a plain 8x8 list (mirroring the bitboards) so the UI, Move objects and
+        the Piece classes keep working, while move generation and check detection run on the bitboards.
+    """
+    def __init__(self):
+        super().__init__()
+        self.king = King(self) # Castling rules are shared with the mailbox engine
+        self.loadBoard(self.board)
+
+    @staticmethod
+    def fromGameState(gameState):
+        """
+            Builds a BitboardGameState holding the same position and history as [gameState]
+        """
+        bitboardState = BitboardGameState()
+        bitboardState.loadBoard(gameState.board, gameState.whiteTurn, gameState.getCastleRights(), gameState.enPassantSquare)
+        bitboardState.moveLog = list(gameState.moveLog)
+        bitboardState.undoStack = list(gameState.undoStack)
+        bitboardState.zobristKey = gameState.zobristKey
+        bitboardState.status = gameState.status
+        return bitboardState
+
+    """
+        Update Board State Functions
+    """
+    def setSquare(self, row: int, col: int, piece: str):
+        bit = 1 << (row * 8 + col)
+        oldPiece = self.board[row][col]
+        if oldPiece != "--":
+            self.pieceBitboards[oldPiece] &= ~bit
+            self.occupancy[oldPiece[0]] &= ~bit
+        if piece != "--":
+            self.pieceBitboards[piece] |= bit
+            self.occupancy[piece[0]] |= bit
+        super().setSquare(row, col, piece)
+
+    def loadBoard(self, board, whiteTurn = True, castleRights = None, enPassantSquare = ()):
+        self.pieceBitboards = {piece: 0 for piece in PIECES}
+        self.occupancy = {"w": 0, "b": 0}
+
+        # Work on a plain list copy, which is both faster to index than a NumPy array and independent of the caller's board
+        board = [[str(piece) for piece in row] for row in board]
+        for row in range(8):
+            for col in range(8):
+                piece = board[row][col]
+                if piece != "--":
+                    self.pieceBitboards[piece] |= 1 << (row * 8 + col)
+                    self.occupancy[piece[0]] |= 1 << (row * 8 + col)
+        super().loadBoard(board, whiteTurn, castleRights, enPassantSquare)
+
+    def reset(self):
+        super().reset()
+        self.loadBoard(self.board)
+
+    """
+        Validate Check Functions
+    """
+    def isSquareAttacked(self, square, byColor: str) -> bool:
+        sq = square[0] * 8 + square[1]
+        bitboards = self.pieceBitboards
+        if KNIGHT_ATTACKS[sq] & bitboards[byColor + "N"]: return True
+        if PAWN_ATTACKS["b" if byColor == "w" else "w"][sq] & bitboards[byColor + "P"]: return True
+        if KING_ATTACKS[sq] & bitboards[byColor + "K"]: return True
+
+        occupied = self.occupancy["w"] | self.occupancy["b"]
+        queens = bitboards[byColor + "Q"]
+        if rookAttacks(sq, occupied) & (bitboards[byColor + "R"] | queens): return True
+        if bishopAttacks(sq, occupied) & (bitboards[byColor + "B"] | queens): return True
+        return False
+
+    def generateAttackers(self, square, byColor: str):
+        sq = square[0] * 8 + square[1]
+        bitboards = self.pieceBitboards
+        occupied = self.occupancy["w"] | self.occupancy["b"]
+        queens = bitboards[byColor + "Q"]
+        attackers = (KNIGHT_ATTACKS[sq] & bitboards[byColor + "N"])\
+            | (PAWN_ATTACKS["b" if byColor == "w" else "w"][sq] & bitboards[byColor + "P"])\
+            | (KING_ATTACKS[sq] & bitboards[byColor + "K"])\
+            | (rookAttacks(sq, occupied) & (bitboards[byColor + "R"] | queens))\
+            | (bishopAttacks(sq, occupied) & (bitboards[byColor + "B"] | queens))
+        for attackerSq in iterateBits(attackers):
+            yield divmod(attackerSq, 8)
+
+    """
+        Possible Move Functions
+    """
+    def getPossiblePackedMoves(self, whiteTurn: bool):
+        bitboards = self.pieceBitboards
+        allyColor = "w" if whiteTurn else "b"
+        enemyColor = "b" if whiteTurn else "w"
+        ally = self.occupancy[allyColor]
+        enemy = self.occupancy[enemyColor]
+        occupied = ally | enemy
+        notAlly = ~ally & FULL_BOARD
+
+        possibleMoves = []
+        self.addPawnMoves(possibleMoves, allyColor, bitboards[allyColor + "P"], enemy, occupied)
+
+        for sq in iterateBits(bitboards[allyColor + "N"]):
+            self.addMoves(possibleMoves, sq, KNIGHT_ATTACKS[sq] & notAlly)
+        for sq in iterateBits(bitboards[allyColor + "B"]):
+            self.addMoves(possibleMoves, sq, bishopAttacks(sq, occupied) & notAlly)
+        for sq in iterateBits(bitboards[allyColor + "R"]):
+            self.addMoves(possibleMoves, sq, rookAttacks(sq, occupied) & notAlly)
+        for sq in iterateBits(bitboards[allyColor + "Q"]):
+            self.addMoves(possibleMoves, sq, (rookAttacks(sq, occupied) | bishopAttacks(sq, occupied)) & notAlly)
+        for sq in iterateBits(bitboards[allyColor + "K"]):
+            self.addMoves(possibleMoves, sq, KING_ATTACKS[sq] & notAlly)
+            possibleMoves += self.king.getCastleMoves(sq // 8, sq % 8, allyColor)
+        return possibleMoves
+
+    def addMoves(self, possibleMoves, startSq: int, targets: int):
+        for endSq in iterateBits(targets):
+            possibleMoves.append(startSq | (endSq << PackedMove.END_SHIFT))
+
+    def addPawnMoves(self, possibleMoves, allyColor: str, pawns: int, enemy: int, occupied: int):
+        empty = ~occupied & FULL_BOARD
+        if allyColor == "w":
+            singlePushes = (pawns >> 8) & empty
+            doublePushes = ((singlePushes & ROW_MASKS[5]) >> 8) & empty
+            forward = -8
+            promotionRow = ROW_MASKS[0]
+        else:
+            singlePushes = (pawns << 8) & empty
+            doublePushes = ((singlePushes & ROW_MASKS[2]) << 8) & empty
+            forward = 8
+            promotionRow = ROW_MASKS[7]
+
+        for endSq in iterateBits(singlePushes & ~promotionRow):
+            possibleMoves.append(PackedMove.encode(endSq - forward, endSq))
+        for endSq in iterateBits(singlePushes & promotionRow):
+            possibleMoves.append(PackedMove.encode(endSq - forward, endSq, PackedMove.PROMOTION_FLAG, "Q"))
+        for endSq in iterateBits(doublePushes):
+            possibleMoves.append(PackedMove.encode(endSq - 2 * forward, endSq, PackedMove.DOUBLE_PAWN_PUSH_FLAG))
+
+        enPassantSquare = self.enPassantSquare
+        enPassantBit = 1 << (enPassantSquare[0] * 8 + enPassantSquare[1]) if enPassantSquare != () else 0
+        attackTable = PAWN_ATTACKS[allyColor]
+        for sq in iterateBits(pawns):
+            attacks = attackTable[sq]
+            for endSq in iterateBits(attacks & enemy):
+                if (1 << endSq) & promotionRow: possibleMoves.append(PackedMove.encode(sq, endSq, PackedMove.PROMOTION_FLAG, "Q"))
+                else: possibleMoves.append(PackedMove.encode(sq, endSq))
+            if attacks & enPassantBit:
+                possibleMoves.append(PackedMove.encode(sq, enPassantSquare[0] * 8 + enPassantSquare[1], PackedMove.EN_PASSANT_FLAG))
+
+def createGameState(fen: str, useBitboard: bool = False) -> GameState:
+    """
+        Game state of the position [fen], a BitboardGameState if [useBitboard]
+    """
+    return (BitboardGameState if useBitboard else GameState).fromFEN(fen)
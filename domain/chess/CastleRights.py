@@ -2,6 +2,13 @@ class CastleRights:
     """
         Information regarding the chess Castle Rights
     """
+    # Bit flags used by the integer form of the castle rights (see toMask)
+    WHITE_KING_SIDE = 1
+    WHITE_QUEEN_SIDE = 2
+    BLACK_KING_SIDE = 4
+    BLACK_QUEEN_SIDE = 8
+    ALL = 15
+
     def __init__(self, whiteKingSide = True, whiteQueenSide = True, blackKingSide = True, blackQueenSide = True):
         self.whiteKingSide = whiteKingSide
         self.whiteQueenSide = whiteQueenSide
@@ -39,5 +46,39 @@ class CastleRights:
             elif col == 7:
                 self.blackKingSide = False
 
+    def updateFromBoard(self, board):
+        """
+            Removes the rights whose king or rook is not on its home square of [board] (8x8, same format as GameState.board).
+            Called on every position of a game, a right lost once stays lost even if the piece goes back to its square
+        """
+        if board[7][4] != "wK": self.setFalse("w")
+        if board[0][4] != "bK": self.setFalse("b")
+        for col in (0, 7):
+            if board[7][col] != "wR": self.setCastleRookWhite(7, col)
+            if board[0][col] != "bR": self.setCastleRookBlack(0, col)
+
+    def toMask(self) -> int:
+        return (self.WHITE_KING_SIDE if self.whiteKingSide else 0) | (self.WHITE_QUEEN_SIDE if self.whiteQueenSide else 0)\
+            | (self.BLACK_KING_SIDE if self.blackKingSide else 0) | (self.BLACK_QUEEN_SIDE if self.blackQueenSide else 0)
+
+    @staticmethod
+    def fromMask(mask: int):
+        return CastleRights(
+            whiteKingSide = bool(mask & CastleRights.WHITE_KING_SIDE),
+            whiteQueenSide = bool(mask & CastleRights.WHITE_QUEEN_SIDE),
+            blackKingSide = bool(mask & CastleRights.BLACK_KING_SIDE),
+            blackQueenSide = bool(mask & CastleRights.BLACK_QUEEN_SIDE)
+        )
+
     def __str__(self) -> str:
         return f"[wks: {self.whiteKingSide}, wqs: {self.whiteQueenSide}, bks: {self.blackKingSide}, bqs: {self.blackQueenSide}]"
+
+# Castle rights kept when a piece moves from or to each square (row * 8 + col), i.e. moving the king or a rook
+# or capturing a rook on its starting square removes the corresponding rights
+SQUARE_CASTLE_MASKS = [CastleRights.ALL] * 64
+SQUARE_CASTLE_MASKS[0] = CastleRights.ALL & ~CastleRights.BLACK_QUEEN_SIDE
+SQUARE_CASTLE_MASKS[7] = CastleRights.ALL & ~CastleRights.BLACK_KING_SIDE
+SQUARE_CASTLE_MASKS[4] = CastleRights.ALL & ~(CastleRights.BLACK_KING_SIDE | CastleRights.BLACK_QUEEN_SIDE)
+SQUARE_CASTLE_MASKS[56] = CastleRights.ALL & ~CastleRights.WHITE_QUEEN_SIDE
+SQUARE_CASTLE_MASKS[63] = CastleRights.ALL & ~CastleRights.WHITE_KING_SIDE
+SQUARE_CASTLE_MASKS[60] = CastleRights.ALL & ~(CastleRights.WHITE_KING_SIDE | CastleRights.WHITE_QUEEN_SIDE)
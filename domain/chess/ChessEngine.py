@@ -1,6 +1,11 @@
 import numpy as np
 from domain.chess.Piece import *
 from domain.chess.Status import Status
+from domain.chess.CastleRights import CastleRights, SQUARE_CASTLE_MASKS
+from domain.chess.Move import Move
+import domain.chess.PackedMove as PackedMove
+import domain.chess.Zobrist as Zobrist
+import domain.chess.AttackTables as AttackTables
 
 class GameState():
     """
@@ -29,55 +34,114 @@ class GameState():
         self.status = Status.ONGOING
         self.moveLog = []
 
+        # Squares (row * 8 + col) occupied by each color, kept in sync by setSquare so that
+        # whole-board loops only visit occupied squares
+        self.pieceSquares = self.computePieceSquares()
+
+        # Piece -> 64 square score tables given by the evaluation (see setSquareScoreTables), empty when unused,
+        # and the sums of the scores of each color's pieces in each table, kept in sync by setSquare
+        self.squareScoreTables = ()
+        self.pieceScores = {"w": [], "b": []}
+
         # Find a better way to keep track of king location
         self.whiteKingLocation = (7,4)
         self.blackKingLocation = (0,4)
 
-        self.moveFunctions = {
-            "P": Pawn(self).getPossibleMoves,
-            "N": Knight(self).getPossibleMoves,
-            "R": Rook(self).getPossibleMoves,
-            "B": Bishop(self).getPossibleMoves,
-            "Q": Queen(self).getPossibleMoves,
-            "K": King(self).getPossibleMoves
-        }
+        # Current castle rights (see CastleRights.toMask) and en passant square, () if there is none
+        self.castleRightsMask = CastleRights.ALL
+        self.enPassantSquare = ()
+
+        # (packedMove, pieceMoved, pieceCaptured, castleRightsMask, enPassantSquare) of every applied move,
+        # the last two being the values before the move
+        self.undoStack = []
+
+        # 64-bit position key, updated incrementally by applyMove and undoMove, and the key of the pawns alone
+        self.zobristKey = self.computeZobristKey()
+        self.pawnKey = Zobrist.computePawnKey(self.board)
+
+        pieces = {"P": Pawn(self), "N": Knight(self), "R": Rook(self), "B": Bishop(self), "Q": Queen(self), "K": King(self)}
+        self.moveFunctions = {pieceType: piece.getPossibleMoves for pieceType, piece in pieces.items()}
+        self.packedMoveFunctions = {pieceType: piece.getPackedMoves for pieceType, piece in pieces.items()}
     
     """
         Update Board State Functions
     """
+    def setSquare(self, row: int, col: int, piece: str):
+        """
+            Places [piece] on the given square ("--" clears it).
+            Every board write of applyMove and undoMove goes through here so subclasses can keep
+            any additional board representation in sync
+        """
+        square = row * 8 + col
+        oldPiece = self.board[row][col]
+        scoreTables = self.squareScoreTables
+        if oldPiece != "--":
+            self.pieceSquares[oldPiece[0]].discard(square)
+            if scoreTables:
+                scores = self.pieceScores[oldPiece[0]]
+                for index, scoreTable in enumerate(scoreTables): scores[index] -= scoreTable[oldPiece][square]
+        if piece != "--":
+            self.pieceSquares[piece[0]].add(square)
+            if scoreTables:
+                scores = self.pieceScores[piece[0]]
+                for index, scoreTable in enumerate(scoreTables): scores[index] += scoreTable[piece][square]
+        self.zobristKey ^= Zobrist.PIECE_KEYS[oldPiece][square] ^ Zobrist.PIECE_KEYS[piece][square]
+        self.pawnKey ^= Zobrist.PAWN_KEYS[oldPiece][square] ^ Zobrist.PAWN_KEYS[piece][square]
+        self.board[row][col] = piece
+
     def applyMove(self, move):
-        self.board[move.startRow][move.startCol] = "--"
-        self.board[move.endRow][move.endCol] = move.pieceMoved
+        self.applyPackedMove(PackedMove.fromMove(move))
+        move.castleRights = CastleRights.fromMask(self.castleRightsMask)
+        self.moveLog.append(move)  #log list of moves
 
-        if move.pieceMoved == "wK" : self.whiteKingLocation = (move.endRow, move.endCol)
-        if move.pieceMoved == "bK": self.blackKingLocation = (move.endRow, move.endCol)
+    def applyPackedMove(self, packedMove: int):
+        """
+            Applies a packed move (see PackedMove) without touching the move log or the game status.
+            Everything needed to take it back is pushed onto the undo stack
+        """
+        board = self.board
+        startRow, startCol = divmod(packedMove & PackedMove.SQUARE_MASK, 8)
+        endRow, endCol = divmod((packedMove >> PackedMove.END_SHIFT) & PackedMove.SQUARE_MASK, 8)
+        flag = (packedMove >> PackedMove.FLAG_SHIFT) & PackedMove.FLAG_MASK
+        pieceMoved = board[startRow][startCol]
+        pieceCaptured = board[startRow][endCol] if flag == PackedMove.EN_PASSANT_FLAG else board[endRow][endCol]
+        self.undoStack.append((packedMove, pieceMoved, pieceCaptured, self.castleRightsMask, self.enPassantSquare))
+
+        # Remove the castle rights and en passant square of the previous position from the key
+        self.zobristKey ^= Zobrist.CASTLE_RIGHTS_KEYS[self.castleRightsMask] ^ Zobrist.enPassantKey(self.enPassantSquare)
+
+        self.setSquare(startRow, startCol, "--")
+        if flag == PackedMove.PROMOTION_FLAG:
+            self.setSquare(endRow, endCol, pieceMoved[0] + PackedMove.PROMOTION_PIECES[packedMove >> PackedMove.PROMOTION_SHIFT])
+        else:
+            self.setSquare(endRow, endCol, pieceMoved)
+
+        if pieceMoved == "wK" : self.whiteKingLocation = (endRow, endCol)
+        if pieceMoved == "bK": self.blackKingLocation = (endRow, endCol)
 
-        ## Check Pawn Promotion
-        if (move.isPawnPromotion()): 
-            #if move.piecePromotion == None: move.setPawnPromotion("Q") #Not needed as Move objects defaults Queen as the piece promotion if needed
-            self.board[move.endRow][move.endCol] = move.pieceMoved[0] + move.piecePromotion
-        
         ## Check EnPassant
-        if move.isEnPassant: # and self.board[move.startRow][move.endCol][1] == "P" for added security but unnecessary condition
-            self.board[move.startRow][move.endCol] = "--"
-        
+        if flag == PackedMove.EN_PASSANT_FLAG:
+            self.setSquare(startRow, endCol, "--")
+
         ## Check castling
-        if move.isCastleMove:
-            if move.endCol - move.startCol == 2: #Kingside Castle
-                self.board[move.endRow][move.endCol - 1] = self.board[move.endRow][move.endCol + 1] #Rook Location
-                self.board[move.startRow][move.endCol + 1] = "--"
+        if flag == PackedMove.CASTLE_FLAG:
+            if endCol - startCol == 2: #Kingside Castle
+                self.setSquare(endRow, endCol - 1, board[endRow][endCol + 1]) #Rook Location
+                self.setSquare(startRow, endCol + 1, "--")
             else: #Queenside Castle
-                self.board[move.endRow][move.endCol + 1] = self.board[move.endRow][move.endCol - 2] #Rook Location
-                self.board[move.endRow][move.endCol - 2] = "--"
+                self.setSquare(endRow, endCol + 1, board[endRow][endCol - 2]) #Rook Location
+                self.setSquare(endRow, endCol - 2, "--")
 
-        self.moveLog.append(move)  #log list of moves
+        self.castleRightsMask &= SQUARE_CASTLE_MASKS[startRow * 8 + startCol] & SQUARE_CASTLE_MASKS[endRow * 8 + endCol]
+        self.enPassantSquare = ((startRow + endRow) // 2, startCol) if flag == PackedMove.DOUBLE_PAWN_PUSH_FLAG else ()
 
         self.whiteTurn = not self.whiteTurn
+        self.zobristKey ^= Zobrist.BLACK_TO_MOVE_KEY ^ Zobrist.CASTLE_RIGHTS_KEYS[self.castleRightsMask] ^ Zobrist.enPassantKey(self.enPassantSquare)
 
     def movePiece(self, startLocation, endLocation, piecePromotion = None) -> bool:
         flag = False
-        enPassantSquare = self.moveLog[-1].enPassantSquare if len(self.moveLog) != 0 else None
-        castleRights = CastleRights.copy(self.moveLog[-1].castleRights) if len(self.moveLog) != 0 else None
+        enPassantSquare = self.getEnPassantSquare()
+        castleRights = self.getCastleRights()
 
         moveObject = Move(startLocation, endLocation, self.board, piecePromotion, 
                           prevEnPassantSquare = enPassantSquare,
@@ -104,28 +168,60 @@ class GameState():
     
     def undoMove(self, fromCheck = False):
         if len(self.moveLog) != 0:
-            lastMoveObj = self.moveLog.pop()
-            self.board[lastMoveObj.startRow][lastMoveObj.startCol] = lastMoveObj.pieceMoved
-            self.board[lastMoveObj.endRow][lastMoveObj.endCol] = lastMoveObj.pieceCaptured
-            self.whiteTurn = not self.whiteTurn
-
-            if lastMoveObj.pieceMoved == "wK" : self.whiteKingLocation = (lastMoveObj.startRow, lastMoveObj.startCol)
-            if lastMoveObj.pieceMoved == "bK": self.blackKingLocation = (lastMoveObj.startRow, lastMoveObj.startCol)
-
-            if (lastMoveObj.isEnPassant):
-                self.board[lastMoveObj.endRow][lastMoveObj.endCol] = "--"
-                self.board[lastMoveObj.startRow][lastMoveObj.endCol] = lastMoveObj.pieceCaptured
-
-            if lastMoveObj.isCastleMove:
-                if lastMoveObj.endCol - lastMoveObj.startCol == 2: #Kingside Castle
-                    self.board[lastMoveObj.endRow][lastMoveObj.endCol + 1] = self.board[lastMoveObj.endRow][lastMoveObj.endCol - 1] #Rook Location
-                    self.board[lastMoveObj.startRow][lastMoveObj.endCol - 1] = "--"
-                else: #Queenside Castle
-                    self.board[lastMoveObj.endRow][lastMoveObj.endCol - 2] = self.board[lastMoveObj.endRow][lastMoveObj.endCol + 1] #Rook Location
-                    self.board[lastMoveObj.endRow][lastMoveObj.endCol + 1] = "--"
-
+            self.moveLog.pop()
+            self.undoPackedMove()
             if not fromCheck: self.updateCurrentStatus()
 
+    def undoPackedMove(self):
+        """
+            Takes back the last move applied by applyPackedMove (or applyMove)
+        """
+        packedMove, pieceMoved, pieceCaptured, castleRightsMask, enPassantSquare = self.undoStack.pop()
+        startRow, startCol = divmod(packedMove & PackedMove.SQUARE_MASK, 8)
+        endRow, endCol = divmod((packedMove >> PackedMove.END_SHIFT) & PackedMove.SQUARE_MASK, 8)
+        flag = (packedMove >> PackedMove.FLAG_SHIFT) & PackedMove.FLAG_MASK
+
+        self.zobristKey ^= Zobrist.CASTLE_RIGHTS_KEYS[self.castleRightsMask] ^ Zobrist.enPassantKey(self.enPassantSquare)
+        self.zobristKey ^= Zobrist.CASTLE_RIGHTS_KEYS[castleRightsMask] ^ Zobrist.enPassantKey(enPassantSquare)
+        self.zobristKey ^= Zobrist.BLACK_TO_MOVE_KEY
+        self.castleRightsMask = castleRightsMask
+        self.enPassantSquare = enPassantSquare
+        self.whiteTurn = not self.whiteTurn
+
+        self.setSquare(startRow, startCol, pieceMoved)
+        if flag == PackedMove.EN_PASSANT_FLAG:
+            self.setSquare(endRow, endCol, "--")
+            self.setSquare(startRow, endCol, pieceCaptured)
+        else:
+            self.setSquare(endRow, endCol, pieceCaptured)
+
+        if pieceMoved == "wK" : self.whiteKingLocation = (startRow, startCol)
+        if pieceMoved == "bK": self.blackKingLocation = (startRow, startCol)
+
+        if flag == PackedMove.CASTLE_FLAG:
+            if endCol - startCol == 2: #Kingside Castle
+                self.setSquare(endRow, endCol + 1, self.board[endRow][endCol - 1]) #Rook Location
+                self.setSquare(startRow, endCol - 1, "--")
+            else: #Queenside Castle
+                self.setSquare(endRow, endCol - 2, self.board[endRow][endCol + 1]) #Rook Location
+                self.setSquare(endRow, endCol + 1, "--")
+
+    def applyNullMove(self):
+        """
+            Passes the turn without moving a piece, only used by the search (null move pruning).
+            Returns the en passant square it clears, to be given back to undoNullMove
+        """
+        enPassantSquare = self.enPassantSquare
+        self.zobristKey ^= Zobrist.BLACK_TO_MOVE_KEY ^ Zobrist.enPassantKey(enPassantSquare)
+        self.enPassantSquare = ()
+        self.whiteTurn = not self.whiteTurn
+        return enPassantSquare
+
+    def undoNullMove(self, enPassantSquare):
+        self.zobristKey ^= Zobrist.BLACK_TO_MOVE_KEY ^ Zobrist.enPassantKey(enPassantSquare)
+        self.enPassantSquare = enPassantSquare
+        self.whiteTurn = not self.whiteTurn
+
     def reset(self):
         self.board = np.array([
             ["bR", "bN", "bB", "bQ", "bK", "bB", "bN", "bR"],
@@ -142,14 +238,94 @@ class GameState():
         self.whiteTurn = True
         self.status = Status.ONGOING
         self.moveLog = []
-    
+        self.castleRightsMask = CastleRights.ALL
+        self.enPassantSquare = ()
+        self.undoStack = []
+        self.pieceSquares = self.computePieceSquares()
+        self.pieceScores = self.computePieceScores()
+        self.zobristKey = self.computeZobristKey()
+        self.pawnKey = Zobrist.computePawnKey(self.board)
+
+    def loadBoard(self, board, whiteTurn = True, castleRights = None, enPassantSquare = ()):
+        """
+            Replaces the current position with [board] (8x8, same format as self.board) and clears the move log.
+            Use this instead of assigning self.board directly so that the king locations, the position key
+            and any derived board representation are rebuilt
+        """
+        self.board = board
+        self.whiteTurn = whiteTurn
+        self.moveLog = []
+        self.castleRightsMask = castleRights.toMask() if castleRights != None else CastleRights.ALL
+        self.enPassantSquare = enPassantSquare
+        self.undoStack = []
+        self.pieceSquares = self.computePieceSquares()
+        self.pieceScores = self.computePieceScores()
+        self.zobristKey = self.computeZobristKey()
+        self.pawnKey = Zobrist.computePawnKey(self.board)
+        for square in self.pieceSquares["w"] | self.pieceSquares["b"]:
+            if board[square >> 3][square & 7] == "wK": self.whiteKingLocation = (square >> 3, square & 7)
+            elif board[square >> 3][square & 7] == "bK": self.blackKingLocation = (square >> 3, square & 7)
+        self.updateCurrentStatus()
+
+    @classmethod
+    def fromFEN(cls, fen: str):
+        """
+            Builds a game state (of the class it is called on) holding the position of the FEN string [fen]
+        """
+        gameState = cls()
+        gameState.loadFEN(fen)
+        return gameState
+
+    def loadFEN(self, fen: str):
+        """
+            Replaces the current position with the one described by the FEN string [fen].
+            The halfmove clock and fullmove number are ignored as the game does not track them
+        """
+        fields = fen.split()
+        board = []
+        for rank in fields[0].split("/"):
+            row = []
+            for char in rank:
+                if char.isdigit(): row += ["--"] * int(char)
+                else: row.append(("w" if char.isupper() else "b") + char.upper())
+            board.append(row)
+
+        castleField = fields[2] if len(fields) > 2 else "-"
+        castleRights = CastleRights("K" in castleField, "Q" in castleField, "k" in castleField, "q" in castleField)
+        enPassantField = fields[3] if len(fields) > 3 else "-"
+        enPassantSquare = () if enPassantField == "-" else (Move.rankToRow[enPassantField[1]], Move.fileToCol[enPassantField[0]])
+        self.loadBoard(np.array(board), len(fields) < 2 or fields[1] == "w", castleRights, enPassantSquare)
+
+    def getFEN(self) -> str:
+        """
+            Returns the FEN string of the current position, with the halfmove clock at 0 and the fullmove number counted from the moves applied since the position was loaded
+        """
+        ranks = []
+        for row in range(8):
+            rank, empty = "", 0
+            for col in range(8):
+                piece = self.board[row][col]
+                if piece == "--":
+                    empty += 1
+                    continue
+                if empty: rank += str(empty)
+                rank += piece[1] if piece[0] == "w" else piece[1].lower()
+                empty = 0
+            ranks.append(rank + (str(empty) if empty else ""))
+
+        castleField = "".join(char for char, right in zip("KQkq", (CastleRights.WHITE_KING_SIDE, CastleRights.WHITE_QUEEN_SIDE,
+                               CastleRights.BLACK_KING_SIDE, CastleRights.BLACK_QUEEN_SIDE)) if self.castleRightsMask & right)
+        enPassantField = "-" if self.enPassantSquare == () else Move.colToFile[self.enPassantSquare[1]] + Move.rowToRank[self.enPassantSquare[0]]
+        return " ".join(["/".join(ranks), "w" if self.whiteTurn else "b", castleField or "-", enPassantField, "0",
+                         str(len(self.undoStack) // 2 + 1)])
+
     def updateCurrentStatus(self):
         self.status = Status.ONGOING
 
         if (self.inCheck(self.whiteTurn)) :   
             self.status = Status.CHECK
         
-        if (len(self.getAllValidMoves(self.whiteTurn)) == 0):
+        if (len(self.getAllValidPackedMoves(self.whiteTurn)) == 0):
             self.status = Status.CHECKMATE if self.status == Status.CHECK else Status.STALEMATE
 
     def performMove(self, move):
@@ -164,7 +340,8 @@ class GameState():
     """
 
     def inCheck(self, whiteTurn: bool) -> bool:
-        return self.in_check_naive_OTS(whiteTurn)
+        kingLocation = self.whiteKingLocation if whiteTurn else self.blackKingLocation
+        return self.isSquareAttacked(kingLocation, "b" if whiteTurn else "w")
     
     def in_check_naive(self, whiteTurn) -> bool:
         possibleMoves = self.getPossibleMoves(not whiteTurn)
@@ -185,23 +362,67 @@ class GameState():
 
         # We want to indetify the attack piece of the opposing player
         whiteTurn = not whiteTurn
-        for row in range(len(self.board)):
-            for col in range(len(self.board[row])):
-                allyColor = self.board[row][col][0]
-                if (allyColor == "w" and whiteTurn) or (allyColor == "b" and not whiteTurn):
-                    allyPiece = self.board[row][col][1]
-                    possibleMoves = self.moveFunctions[allyPiece](row, col)
-                    for move in possibleMoves:
-                        if kingLocation[0] == move.endRow and kingLocation[1] == move.endCol: 
-                            return True
+        for row, col in self.getPieceLocations(whiteTurn):
+            allyPiece = self.board[row][col][1]
+            possibleMoves = self.moveFunctions[allyPiece](row, col)
+            for move in possibleMoves:
+                if kingLocation[0] == move.endRow and kingLocation[1] == move.endCol: 
+                    return True
         return False
 
     def givesCheck(self, move, whiteTurn: bool) -> bool:
-        self.applyMove(move)
+        return self.packedMoveGivesCheck(PackedMove.fromMove(move), whiteTurn)
+
+    def packedMoveGivesCheck(self, packedMove: int, whiteTurn: bool) -> bool:
+        """
+            Checks if applying [packedMove] leaves the king of the given side in check
+        """
+        self.applyPackedMove(packedMove)
         flag = self.inCheck(whiteTurn)
-        self.undoMove(fromCheck = True)
+        self.undoPackedMove()
         return flag
     
+    def isSquareAttacked(self, square, byColor: str) -> bool:
+        """
+            Checks if [square] (row, col) is attacked by any piece of [byColor] ("w" or "b")
+        """
+        for _ in self.generateAttackers(square, byColor):
+            return True
+        return False
+
+    def attackersOf(self, square, byColor: str = None):
+        """
+            Returns the (row, col) locations of every piece attacking [square], optionally only those of [byColor]
+        """
+        if byColor != None: return list(self.generateAttackers(square, byColor))
+        return list(self.generateAttackers(square, "w")) + list(self.generateAttackers(square, "b"))
+
+    def generateAttackers(self, square, byColor: str):
+        """
+            Yields the pieces of [byColor] attacking [square].
+            Rather than generating the moves of every enemy piece, this looks outwards from [square]:
+            the knight, pawn and king offsets, and each line up to its first blocker
+        """
+        board = self.board
+        row, col = square
+        square = row * 8 + col
+
+        for end in AttackTables.KNIGHT_TARGETS[square]:
+            if board[end >> 3][end & 7] == byColor + "N": yield (end >> 3, end & 7)
+
+        # A pawn of [byColor] attacks [square] from the squares an enemy pawn on [square] would capture on
+        for end in AttackTables.PAWN_CAPTURES["b" if byColor == "w" else "w"][square]:
+            if board[end >> 3][end & 7] == byColor + "P": yield (end >> 3, end & 7)
+
+        for direction, ray in enumerate(AttackTables.RAYS):
+            sliders = "RQ" if direction in AttackTables.ROOK_DIRECTIONS else "BQ"
+            for distance, end in enumerate(ray[square]):
+                endPiece = board[end >> 3][end & 7]
+                if endPiece != "--":
+                    if endPiece[0] == byColor and (endPiece[1] in sliders or (endPiece[1] == "K" and distance == 0)):
+                        yield (end >> 3, end & 7)
+                    break
+
     def squareUnderAttack_Naive(self, row: int, col: int) -> bool: ##....
         possibleMoves = self.getPossibleMoves(not self.whiteTurn)
         for move in possibleMoves:
@@ -216,24 +437,199 @@ class GameState():
     """
         Possible Move Functions
     """
-    def getPossibleMoves(self, whiteTurn: bool): #Improvmement: Make it more efficient
+    def getPossibleMoves(self, whiteTurn: bool):
+        board = self.board
+        return [PackedMove.toMove(packedMove, board) for packedMove in self.getPossiblePackedMoves(whiteTurn)]
+
+    def getPossiblePackedMoves(self, whiteTurn: bool):
         possibleMoves = []
-        for row in range(len(self.board)):
-            for col in range(len(self.board[row])):
-                allyColor = self.board[row][col][0]
-                if (allyColor == "w" and whiteTurn) or (allyColor == "b" and not whiteTurn):
-                    allyPiece = self.board[row][col][1]
-                    possibleMoves += self.moveFunctions[allyPiece](row, col)
+        board = self.board
+        for row, col in self.getPieceLocations(whiteTurn):
+            possibleMoves += self.packedMoveFunctions[board[row][col][1]](row, col)
         return possibleMoves
-    
+
     def getAllValidMoves(self, whiteTurn: bool):
-        allMoves = self.getPossibleMoves(whiteTurn)
-        for i in range(len(allMoves) - 1, -1, -1):
-            if self.givesCheck(allMoves[i], whiteTurn) : allMoves.remove(allMoves[i])
-        return allMoves        
+        board = self.board
+        return [PackedMove.toMove(packedMove, board) for packedMove in self.getAllValidPackedMoves(whiteTurn)]
+
+    def getAllValidPackedMoves(self, whiteTurn: bool):
+        """
+            Returns the legal moves of the given side as packed moves.
+            Checking pieces and pinned pieces are computed once, so most pseudo-legal moves can be accepted
+            or rejected without applying them. Only king moves and en passant captures (which can expose the king
+            along the rank of both pawns) are still verified by applying the move.
+            Castling through check is already excluded by King.getPackedMoves
+        """
+        allMoves = self.getPossiblePackedMoves(whiteTurn)
+        checks, pins = self.getChecksAndPins(whiteTurn)
+        kingRow, kingCol = self.whiteKingLocation if whiteTurn else self.blackKingLocation
+        kingSquare = kingRow * 8 + kingCol
+        return [move for move in allMoves if self.isLegalPackedMove(move, whiteTurn, kingSquare, checks, pins)]
+
+    def generateStagedMoves(self, whiteTurn: bool, hashMove: int = None, killerMoves = (), captureOrder = None, quietOrder = None):
+        """
+            Lazily yields the legal packed moves of the given side in stages:
+                1. [hashMove], if it is legal in this position
+                2. captures, en passant and promotions, sorted by [captureOrder] if given
+                3. [killerMoves], quiet moves that are also pseudo-legal here
+                4. the other quiet moves, sorted by [quietOrder] if given
+            [captureOrder] and [quietOrder] are sort keys of a packed move, higher values first.
+            Each move is only legality-checked when it is about to be yielded, so a search that cuts off
+            early skips validating the rest. Nothing is generated until the first move is requested, and the
+            position must be the same (moves applied in between undone) every time the next move is requested
+        """
+        checks, pins = self.getChecksAndPins(whiteTurn)
+        kingRow, kingCol = self.whiteKingLocation if whiteTurn else self.blackKingLocation
+        kingSquare = kingRow * 8 + kingCol
+        board = self.board
+
+        if hashMove != None:
+            startRow, startCol = divmod(hashMove & PackedMove.SQUARE_MASK, 8)
+            startPiece = board[startRow][startCol]
+            # Only the moves of the piece on the start square are needed to tell whether the hash move is playable
+            if startPiece[0] == ("w" if whiteTurn else "b") and hashMove in self.packedMoveFunctions[startPiece[1]](startRow, startCol)\
+                and self.isLegalPackedMove(hashMove, whiteTurn, kingSquare, checks, pins):
+                yield hashMove
+
+        captureMoves = []
+        quietMoves = []
+        for move in self.getPossiblePackedMoves(whiteTurn):
+            if move == hashMove: continue
+            end = (move >> PackedMove.END_SHIFT) & PackedMove.SQUARE_MASK
+            flag = (move >> PackedMove.FLAG_SHIFT) & PackedMove.FLAG_MASK
+            if board[end >> 3][end & 7] == "--" and flag != PackedMove.EN_PASSANT_FLAG and flag != PackedMove.PROMOTION_FLAG:
+                quietMoves.append(move)
+            elif captureOrder == None:
+                if self.isLegalPackedMove(move, whiteTurn, kingSquare, checks, pins): yield move
+            else: captureMoves.append(move)
+
+        if captureOrder != None:
+            captureMoves.sort(key = captureOrder, reverse = True)
+            for move in captureMoves:
+                if self.isLegalPackedMove(move, whiteTurn, kingSquare, checks, pins): yield move
+
+        for move in killerMoves:
+            if move != None and move != hashMove and move in quietMoves:
+                quietMoves.remove(move)
+                if self.isLegalPackedMove(move, whiteTurn, kingSquare, checks, pins): yield move
+
+        if quietOrder != None: quietMoves.sort(key = quietOrder, reverse = True)
+        for move in quietMoves:
+            if self.isLegalPackedMove(move, whiteTurn, kingSquare, checks, pins): yield move
+
+    def isLegalPackedMove(self, move: int, whiteTurn: bool, kingSquare: int, checks, pins) -> bool:
+        """
+            Checks if the pseudo-legal [move] is legal, given the (checks, pins) of getChecksAndPins
+            and the square of the king of the side to move
+        """
+        start = move & PackedMove.SQUARE_MASK
+        end = (move >> PackedMove.END_SHIFT) & PackedMove.SQUARE_MASK
+        if start == kingSquare:
+            return not self.packedMoveGivesCheck(move, whiteTurn)
+        if len(checks) > 1: # Double check, only the king can move
+            return False
+        if (move >> PackedMove.FLAG_SHIFT) & PackedMove.FLAG_MASK == PackedMove.EN_PASSANT_FLAG:
+            return not self.packedMoveGivesCheck(move, whiteTurn)
+        pinDirection = pins.get(start)
+        # A pinned piece may only move along the line between the king and the pinning piece
+        if pinDirection != None and ((end >> 3) - (start >> 3)) * pinDirection[1] != ((end & 7) - (start & 7)) * pinDirection[0]:
+            return False
+        # In check, the move has to capture the checking piece or block its line
+        return len(checks) == 0 or end in checks[0]
+
+    def getChecksAndPins(self, whiteTurn: bool):
+        """
+            Looks outwards from the king of the given side along every line and knight/pawn offset.
+            Squares are given as row * 8 + col. Returns (checks, pins) where
+                checks - list with one entry per checking piece: the set of squares (checking piece included)
+                         on which a move would capture or block that check
+                pins   - dict of {square: (dRow, dCol)} for every ally piece pinned against the king,
+                         with the direction of the line from the king to the pinned piece
+        """
+        board = self.board
+        kingRow, kingCol = self.whiteKingLocation if whiteTurn else self.blackKingLocation
+        allyColor = "w" if whiteTurn else "b"
+        enemyColor = "b" if whiteTurn else "w"
+        checks = []
+        pins = {}
+
+        kingSquare = kingRow * 8 + kingCol
+        for direction, ray in enumerate(AttackTables.RAYS):
+            sliders = "RQ" if direction in AttackTables.ROOK_DIRECTIONS else "BQ"
+            lineSquares = []
+            pinnedSquare = None
+            for end in ray[kingSquare]:
+                endPiece = board[end >> 3][end & 7]
+                lineSquares.append(end)
+                if endPiece[0] == allyColor:
+                    if pinnedSquare != None: break # Second ally piece, nothing is pinned
+                    pinnedSquare = end
+                elif endPiece[0] == enemyColor:
+                    if endPiece[1] in sliders:
+                        if pinnedSquare == None: checks.append(set(lineSquares))
+                        else: pins[pinnedSquare] = AttackTables.DIRECTIONS[direction]
+                    break
+
+        for end in AttackTables.KNIGHT_TARGETS[kingSquare]:
+            if board[end >> 3][end & 7] == enemyColor + "N": checks.append({end})
+
+        # Enemy pawns attack the king from the squares an ally pawn on the king's square would capture on
+        for end in AttackTables.PAWN_CAPTURES[allyColor][kingSquare]:
+            if board[end >> 3][end & 7] == enemyColor + "P": checks.append({end})
+
+        return checks, pins
 
     """
         Current state function
     """
     def currentPieceTurn(self):
-        return "w" if self.whiteTurn else "b"
\ No newline at end of file
+        return "w" if self.whiteTurn else "b"
+
+    def getPieceLocations(self, whiteTurn: bool):
+        """
+            Returns the (row, col) locations of the pieces of the given side, in board order
+        """
+        return [(square >> 3, square & 7) for square in sorted(self.pieceSquares["w" if whiteTurn else "b"])]
+
+    def computePieceSquares(self):
+        """
+            Builds the occupied squares of each color from scratch, self.pieceSquares should always be equal to this
+        """
+        pieceSquares = {"w": set(), "b": set()}
+        for row in range(8):
+            for col in range(8):
+                if self.board[row][col] != "--": pieceSquares[self.board[row][col][0]].add(row * 8 + col)
+        return pieceSquares
+
+    def setSquareScoreTables(self, squareScoreTables):
+        """
+            [squareScoreTables] - tables of piece -> list of the score of that piece on each of the 64 squares.
+            From then on self.pieceScores[color][index] holds the sum of the scores of that color's pieces in the table
+            at [index], updated by every move and taken back by every undo, so that an evaluation built on them costs
+            the same whatever the number of pieces
+        """
+        self.squareScoreTables = squareScoreTables
+        self.pieceScores = self.computePieceScores()
+
+    def computePieceScores(self):
+        """
+            Sums the square scores of each color from scratch, self.pieceScores should always be equal to this
+        """
+        pieceScores = {"w": [0] * len(self.squareScoreTables), "b": [0] * len(self.squareScoreTables)}
+        for color, squares in self.pieceSquares.items():
+            for square in squares:
+                piece = self.board[square >> 3][square & 7]
+                for index, scoreTable in enumerate(self.squareScoreTables): pieceScores[color][index] += scoreTable[piece][square]
+        return pieceScores
+
+    def getEnPassantSquare(self):
+        return self.enPassantSquare
+
+    def getCastleRights(self) -> CastleRights:
+        return CastleRights.fromMask(self.castleRightsMask)
+
+    def computeZobristKey(self) -> int:
+        """
+            Computes the position key from scratch, self.zobristKey should always be equal to this
+        """
+        return Zobrist.computeKey(self.board, self.whiteTurn, self.castleRightsMask, self.enPassantSquare)
\ No newline at end of file
@@ -11,6 +11,9 @@ class Move():
 
     legalPromotionPieces = ["R", "N", "B", "Q"]
 
+    __slots__ = ("startRow", "startCol", "endRow", "endCol", "pieceMoved", "pieceCaptured", "piecePromotion",
+                 "isEnPassant", "enPassantSquare", "castleRights", "isCastleMove", "moveID")
+
     def __init__(self, startLocation, endLocation, board, 
                  piecePromotion = None,  isEnPassant = False, 
                  prevEnPassantSquare = None, prevCastleMoveRights = None,
@@ -24,8 +27,6 @@ class Move():
         self.pieceMoved = board[self.startRow][self.startCol]
         self.pieceCaptured = board[self.endRow][self.endCol]
 
-        self.board = board
-
         # Pawn promotion
         self.piecePromotion = None if not self.isPawnPromotion() else "Q" if piecePromotion == None else piecePromotion
 
@@ -42,7 +43,7 @@ class Move():
         self.moveID = self.startRow * 1000 + self.startCol * 100 + self.endRow * 10 + self.endCol
     
     def isPawnPromotion(self) -> bool:
-        return ((self.pieceMoved == "wP" and self.endRow == 0 ) or (self.pieceMoved == "bP" and self.endRow == len(self.board[0]) - 1))
+        return ((self.pieceMoved == "wP" and self.endRow == 0 ) or (self.pieceMoved == "bP" and self.endRow == 7))
     
     def setPawnPromotion(self, promotedPiece):
         #If promoted piece is illegal, the default promotion is Queen
@@ -55,7 +56,7 @@ class Move():
             #The last condition might not be needed as an enPassantSquare is always an empty square
         return (self.pieceMoved[1] == "P" and (self.endRow, self.endCol) == enPassantSquare\
                 and abs(self.endRow - self.startRow) == 1 and abs(self.endCol - self.startCol) == 1\
-                    and self.board[self.endRow][self.endCol] == "--") 
+                    and (self.isEnPassant or self.pieceCaptured == "--")) 
     
     def setEnPassant(self, isEnpassant):
             self.isEnPassant = isEnpassant
@@ -87,6 +88,12 @@ class Move():
         Castle Rights
     """
     def updateCastleRight(self):
+        # Capturing a rook on its starting square removes the opponent's castle right on that side
+        if self.pieceCaptured == "wR":
+            self.castleRights.setCastleRookWhite(self.endRow, self.endCol)
+        elif self.pieceCaptured == "bR":
+            self.castleRights.setCastleRookBlack(self.endRow, self.endCol)
+
         if self.pieceMoved[0] == "w":
             if self.pieceMoved[1] == "K":
                 self.castleRights.setFalse("w")
@@ -0,0 +1,73 @@
+from domain.chess.Move import Move
+
+"""
+    Compact integer move encoding used by move generation and the search.
+
+    bits 0 - 5   start square (row * 8 + col)
+    bits 6 - 11  end square
+    bits 12 - 14 flag
+    bits 15 - 17 promotion piece (index into PROMOTION_PIECES, only set together with PROMOTION_FLAG)
+
+    The piece captured and the previous castle rights / en passant square are not part of the move,
+    GameState keeps them on its undo stack when the move is applied.
+"""
+SQUARE_MASK = 0x3F
+END_SHIFT = 6
+FLAG_SHIFT = 12
+FLAG_MASK = 0x7
+PROMOTION_SHIFT = 15
+
+NORMAL_FLAG = 0
+DOUBLE_PAWN_PUSH_FLAG = 1
+EN_PASSANT_FLAG = 2
+CASTLE_FLAG = 3
+PROMOTION_FLAG = 4
+
+PROMOTION_PIECES = [None, "N", "B", "R", "Q"]
+PROMOTION_CODES = {"N": 1, "B": 2, "R": 3, "Q": 4}
+
+def encode(startSquare: int, endSquare: int, flag: int = NORMAL_FLAG, promotionPiece: str = None) -> int:
+    packedMove = startSquare | (endSquare << END_SHIFT) | (flag << FLAG_SHIFT)
+    if promotionPiece != None: packedMove |= PROMOTION_CODES[promotionPiece] << PROMOTION_SHIFT
+    return packedMove
+
+def getStartSquare(packedMove: int) -> int:
+    return packedMove & SQUARE_MASK
+
+def getEndSquare(packedMove: int) -> int:
+    return (packedMove >> END_SHIFT) & SQUARE_MASK
+
+def getFlag(packedMove: int) -> int:
+    return (packedMove >> FLAG_SHIFT) & FLAG_MASK
+
+def getPromotionPiece(packedMove: int) -> str:
+    return PROMOTION_PIECES[packedMove >> PROMOTION_SHIFT]
+
+"""
+    Conversion from and to Move objects
+"""
+def fromMove(move: Move) -> int:
+    flag = NORMAL_FLAG
+    if move.isEnPassant: flag = EN_PASSANT_FLAG
+    elif move.isCastleMove: flag = CASTLE_FLAG
+    elif move.piecePromotion != None: flag = PROMOTION_FLAG
+    elif move.pieceMoved[1] == "P" and abs(move.endRow - move.startRow) == 2: flag = DOUBLE_PAWN_PUSH_FLAG
+    return encode(move.startRow * 8 + move.startCol, move.endRow * 8 + move.endCol, flag, move.piecePromotion)
+
+def toMove(packedMove: int, board) -> Move:
+    """
+        Builds the Move object of [packedMove] on [board], which must be the position before the move is applied
+    """
+    flag = (packedMove >> FLAG_SHIFT) & FLAG_MASK
+    return Move(divmod(packedMove & SQUARE_MASK, 8), divmod((packedMove >> END_SHIFT) & SQUARE_MASK, 8), board,
+                PROMOTION_PIECES[packedMove >> PROMOTION_SHIFT], isEnPassant = flag == EN_PASSANT_FLAG)
+
+def toString(packedMove: int) -> str:
+    """
+        Coordinate notation of the move, e.g. e2e4 or e7e8q
+    """
+    startRow, startCol = divmod(packedMove & SQUARE_MASK, 8)
+    endRow, endCol = divmod((packedMove >> END_SHIFT) & SQUARE_MASK, 8)
+    promotionPiece = PROMOTION_PIECES[packedMove >> PROMOTION_SHIFT]
+    return Move.colToFile[startCol] + Move.rowToRank[startRow] + Move.colToFile[endCol] + Move.rowToRank[endRow]\
+        + (promotionPiece.lower() if promotionPiece != None else "")
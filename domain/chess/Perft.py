@@ -0,0 +1,109 @@
+import time
+from multiprocessing import Pool
+from domain.chess.ChessEngine import GameState
+from domain.chess.BitboardEngine import createGameState
+import domain.chess.PackedMove as PackedMove
+
+"""
+    Perft (performance test) - counts the leaf nodes of the legal move tree of a position to a fixed depth.
+    The counts of the standard positions below are known, so any difference points to a move generation bug.
+
+    The engine only generates queen promotions, while the reference counts include the under-promotions.
+    Whether a promotion is legal does not depend on the piece promoted to, so every queen promotion is
+    expanded into all four promotion moves here.
+"""
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# (name, fen, node counts from depth 1 onwards)
+STANDARD_POSITIONS = [
+    ("startpos", START_FEN, [20, 400, 8902, 197281, 4865609, 119060324]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", [48, 2039, 97862, 4085603, 193690690]),
+    ("position3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812, 43238, 674624, 11030083]),
+    ("position4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", [6, 264, 9467, 422333, 15833292]),
+    ("position5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", [44, 1486, 62379, 2103487, 89941194]),
+    ("position6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10", [46, 2079, 89890, 3894594, 164075551]),
+]
+
+class PerftResult:
+    """
+        Outcome of a perft run, [divide] holds the (move, nodes) pairs of the root moves when requested
+    """
+    def __init__(self, nodes: int, seconds: float, divide = None):
+        self.nodes = nodes
+        self.seconds = seconds
+        self.divide = divide
+
+    def nodesPerSecond(self) -> float:
+        return self.nodes / self.seconds if self.seconds > 0 else 0.0
+
+def getLegalMoves(gameState: GameState):
+    """
+        Legal packed moves of the side to move, with every promotion expanded into the four promotion pieces
+    """
+    moves = []
+    for move in gameState.getAllValidPackedMoves(gameState.whiteTurn):
+        if (move >> PackedMove.FLAG_SHIFT) & PackedMove.FLAG_MASK == PackedMove.PROMOTION_FLAG:
+            baseMove = move & ((1 << PackedMove.PROMOTION_SHIFT) - 1)
+            moves += [baseMove | (code << PackedMove.PROMOTION_SHIFT) for code in PackedMove.PROMOTION_CODES.values()]
+        else: moves.append(move)
+    return moves
+
+def perft(gameState: GameState, depth: int, bulk: bool = True) -> int:
+    """
+        Counts the leaf nodes [depth] plies below the current position.
+        With [bulk] the last ply is counted from the length of the move list instead of applying each move
+    """
+    if depth == 0: return 1
+    moves = getLegalMoves(gameState)
+    if bulk and depth == 1: return len(moves)
+
+    nodes = 0
+    for move in moves:
+        gameState.applyPackedMove(move)
+        nodes += perft(gameState, depth - 1, bulk)
+        gameState.undoPackedMove()
+    return nodes
+
+def divide(gameState: GameState, depth: int, bulk: bool = True):
+    """
+        Returns the (move, nodes) pairs of every root move, the move in coordinate notation
+    """
+    results = []
+    for move in getLegalMoves(gameState):
+        gameState.applyPackedMove(move)
+        results.append((PackedMove.toString(move), perft(gameState, depth - 1, bulk)))
+        gameState.undoPackedMove()
+    return results
+
+def _perftRootMove(args):
+    """
+        Worker of parallelDivide, counts the subtree of one root move on a position of its own
+    """
+    fen, move, depth, bulk, useBitboard = args
+    gameState = createGameState(fen, useBitboard)
+    gameState.applyPackedMove(move)
+    return PackedMove.toString(move), perft(gameState, depth - 1, bulk)
+
+def parallelDivide(fen: str, depth: int, processes: int, bulk: bool = True, useBitboard: bool = False):
+    """
+        Same as divide, with the root moves split across [processes] worker processes
+    """
+    moves = getLegalMoves(createGameState(fen, useBitboard))
+    with Pool(processes) as pool:
+        return pool.map(_perftRootMove, [(fen, move, depth, bulk, useBitboard) for move in moves])
+
+def runPerft(fen: str, depth: int, useBitboard: bool = False, bulk: bool = True, showDivide: bool = False, processes: int = 1) -> PerftResult:
+    """
+        Runs perft on [fen] and times it. The root moves are split across processes when [processes] > 1,
+        which also yields the divide counts at no extra cost
+    """
+    startTime = time.time()
+    if processes > 1 and depth > 1:
+        results = parallelDivide(fen, depth, processes, bulk, useBitboard)
+        return PerftResult(sum(nodes for _, nodes in results), time.time() - startTime, results if showDivide else None)
+
+    gameState = createGameState(fen, useBitboard)
+    if showDivide:
+        results = divide(gameState, depth, bulk)
+        return PerftResult(sum(nodes for _, nodes in results), time.time() - startTime, results)
+    return PerftResult(perft(gameState, depth, bulk), time.time() - startTime)
@@ -1,171 +1,155 @@
-import domain.chess.ChessEngine as ChessEngine
-from typing import Tuple
-from domain.chess.Move import Move
 from domain.chess.CastleRights import CastleRights
+import domain.chess.PackedMove as PackedMove
+import domain.chess.AttackTables as AttackTables
 
 class Piece:
     """
         Base structure for the chess Pieces
+        Subclasses generate their moves as packed integers (see PackedMove), getPossibleMoves wraps them in Move objects
     """
     def __init__(self, gamestate, isWhite = True):
         self.gamestate = gamestate
         self.isWhite = isWhite
-    
+
     def getPossibleMoves(self, row: int, col: int):
+        board = self.gamestate.board
+        return [PackedMove.toMove(packedMove, board) for packedMove in self.getPackedMoves(row, col)]
+
+    def getPackedMoves(self, row: int, col: int):
         raise NotImplementedError
 
 class Pawn(Piece):
     def __init__(self, gamestate):
         super().__init__(gamestate)
-    
-    def getPossibleMoves(self, row: int, col: int):
-        self.enPassantSquare = self.gamestate.moveLog[-1].enPassantSquare if len(self.gamestate.moveLog) != 0 else None
+
+    def getPackedMoves(self, row: int, col: int):
+        self.enPassantSquare = self.gamestate.getEnPassantSquare()
 
         board = self.gamestate.board
         possibleMoves = []
         allyPiece = board[row][col][0]
         enemyPiece = "b" if allyPiece == "w" else "w"
+        start = row * 8 + col
+        lastRow = AttackTables.PAWN_PROMOTION_ROW[allyPiece]
+
+        # The double push follows the single push in the table, so stop at the first blocked square
+        for end in AttackTables.PAWN_PUSHES[allyPiece][start]:
+            if board[end >> 3][end & 7] != "--": break
+            if abs(end - start) == 16: possibleMoves.append(PackedMove.encode(start, end, PackedMove.DOUBLE_PAWN_PUSH_FLAG))
+            else: self.addMove(possibleMoves, start, end, end >> 3 == lastRow)
+
+        for end in AttackTables.PAWN_CAPTURES[allyPiece][start]:
+            endRow, endCol = end >> 3, end & 7
+            if (board[endRow][endCol][0] == enemyPiece):
+                self.addMove(possibleMoves, start, end, endRow == lastRow)
+            elif (endRow, endCol) == self.enPassantSquare:
+                # An en passant square is always empty, so no need to check the board
+                possibleMoves.append(PackedMove.encode(start, end, PackedMove.EN_PASSANT_FLAG))
 
-        incr = {"w": -1, "b": 1}
-        offsets = [-1, 1] # left, right
-
-        if (0 <= row + incr[allyPiece] <= 7):
-            if board[row + incr[allyPiece]][col] == "--":
-                possibleMoves.append(Move((row, col), (row + incr[allyPiece], col), board))
+        return possibleMoves
 
-        if 0 <= row + 2 * incr[allyPiece]<= 7: # Might be uneccesaery
-            if (row == 6 and allyPiece == "w") or (row == 1 and allyPiece == "b"):
-                if board[row + incr[allyPiece]][col] == "--" and board[row + 2 * incr[allyPiece]][col] == "--":
-                    possibleMoves.append(Move((row, col), (row + 2 * incr[allyPiece], col), board))
+    def addMove(self, possibleMoves, start: int, end: int, isPromotion: bool):
+        if isPromotion: possibleMoves.append(PackedMove.encode(start, end, PackedMove.PROMOTION_FLAG, "Q"))
+        else: possibleMoves.append(PackedMove.encode(start, end))
 
-        for i in offsets:
-            if (0 <= row + incr[allyPiece] <= 7 and 0 <= col + i <= 7):
-                if (board[row + incr[allyPiece]][col + i][0] == enemyPiece): 
-                    possibleMoves.append(Move((row, col), (row + incr[allyPiece], col + i), board))
-                elif board[row + incr[allyPiece]][col + i] == "--" and (row + incr[allyPiece], col + i) == self.enPassantSquare:   
-                    #TODO: If enpassantsquare, then it should be empty, so the first condition might not be needed to reduce computational cost          
-                    possibleMoves.append(ChessEngine.Move((row, col), (row + incr[allyPiece], col + i), board, None, isEnPassant = True))
-                    #possibleMoves.append(ChessEngine.Move((row, col), (row + incr[allyPiece], col + i), board, prevEnPassantSquare=enPassantSquare))
-
-        return possibleMoves
 
+class SlidingPiece(Piece):
+    """
+        Base for the Rook, Bishop and Queen, which move along the rays of [directions] (indices into AttackTables.DIRECTIONS)
+    """
+    directions = ()
 
-class Rook(Piece):
-    def __init__(self, gamestate):
-        super().__init__(gamestate)
-    
-    def getPossibleMoves(self, row: int, col: int):
+    def getPackedMoves(self, row: int, col: int):
         board = self.gamestate.board
         possibleMoves = []
         enemypiece = "b" if board[row][col][0] == "w" else "w"
-        
-        dir = ((-1, 0), (1, 0), (0, -1), (0, 1)) #up, down, left, right
-        for move in dir:
-            i = 1
-            while(i < 8) :
-                endRow = row + move[0] * i
-                endCol = col + move[1] * i
-                if ( 0 <= endRow <= 7 and 0 <= endCol <= 7 ):
-                    endPiece = board[endRow][endCol]
-                    if endPiece == "--": 
-                        possibleMoves.append(Move((row, col), (endRow, endCol), board))
-                        i += 1
-                    elif endPiece[0] == enemypiece : 
-                        possibleMoves.append(Move((row, col), (endRow, endCol), board))
-                        break
-                    else: break
+        start = row * 8 + col
+
+        for direction in self.directions:
+            for end in AttackTables.RAYS[direction][start]:
+                endPiece = board[end >> 3][end & 7]
+                if endPiece == "--":
+                    possibleMoves.append(PackedMove.encode(start, end))
+                elif endPiece[0] == enemypiece :
+                    possibleMoves.append(PackedMove.encode(start, end))
+                    break
                 else: break
         return possibleMoves
 
+class Rook(SlidingPiece):
+    directions = AttackTables.ROOK_DIRECTIONS
+
+    def __init__(self, gamestate):
+        super().__init__(gamestate)
+
 class Knight(Piece):
     def __init__(self, gamestate):
         super().__init__(gamestate)
-    
-    def getPossibleMoves(self, row: int, col: int):
-        ##row and column
+
+    def getPackedMoves(self, row: int, col: int):
         board = self.gamestate.board
         allyPiece  = board[row][col][0]
+        start = row * 8 + col
 
         possibleMoves = []
-        dir = ((1, -2), (-1,-2),
-               (2,-1), (-2,-1),
-               (2, 1), (-2, 1),
-               (1,2), (-1,2))
-
-        for move in dir:
-            endRow = row + move[0]
-            endCol = col + move[1]
-            if (0 <= endRow <= 7 and 0 <= endCol <= 7 ): 
-                endPiece = board[endRow][endCol]
-                if (endPiece[0] != allyPiece): possibleMoves.append(Move((row,col), (endRow, endCol), board))
+        for end in AttackTables.KNIGHT_TARGETS[start]:
+            if (board[end >> 3][end & 7][0] != allyPiece): possibleMoves.append(PackedMove.encode(start, end))
         return possibleMoves
 
-class Bishop(Piece):
+class Bishop(SlidingPiece):
+    directions = AttackTables.BISHOP_DIRECTIONS
+
     def __init__(self, gamestate):
         super().__init__(gamestate)
-    
-    def getPossibleMoves(self, row: int, col: int):
-        board = self.gamestate.board
-        possibleMoves = []
-        enemypiece = "b" if board[row][col][0] == "w" else "w"
-        
-        dir = ((1, -1), (-1, -1), (1, 1), (-1, 1)) #up-left, down-left, up-right, down-right
-        for move in dir:
-            i = 1
-            while(i < 8) :
-                endRow = row + move[0] * i
-                endCol = col + move[1] * i
-                if ( 0 <= endRow <= 7 and 0 <= endCol <= 7 ):
-                    endPiece = board[endRow][endCol]
-                    if endPiece == "--": 
-                        possibleMoves.append(ChessEngine.Move((row, col), (endRow, endCol), board))
-                        i += 1
-                    elif endPiece[0] == enemypiece : 
-                        possibleMoves.append(ChessEngine.Move((row, col), (endRow, endCol), board))
-                        break
-                    else: break
-                else: break
-        return possibleMoves
 
-class Queen(Piece):
+class Queen(SlidingPiece):
+    directions = AttackTables.QUEEN_DIRECTIONS
+
     def __init__(self, gamestate):
         super().__init__(gamestate)
-    
-    def getPossibleMoves(self, row: int, col: int):
-        return Rook(self.gamestate).getPossibleMoves(row, col) + Bishop(self.gamestate).getPossibleMoves(row, col)
 
 class King(Piece):
     def __init__(self, gamestate):
         super().__init__(gamestate)
-    
-    def getPossibleMoves(self, row: int, col: int):
+
+    def getPackedMoves(self, row: int, col: int):
         board = self.gamestate.board
-        castleRights = CastleRights.copy(self.gamestate.moveLog[-1].castleRights) if len(self.gamestate.moveLog) != 0 else CastleRights()
 
         possibleMoves = []
         allyPiece  = board[row][col][0]
+        start = row * 8 + col
+
+        for end in AttackTables.KING_TARGETS[start]:
+            if (board[end >> 3][end & 7][0] != allyPiece):
+                possibleMoves.append(PackedMove.encode(start, end))
+
+        possibleMoves += self.getCastleMoves(row, col, allyPiece)
+        return possibleMoves
 
-        dir = (1,0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1) #up, up-right, right, down-right, down-left, left, up - left
-        for move in dir:
-            endRow = row + move[0]
-            endCol = col + move[1]
-            if (0 <= endRow <= 7 and 0 <= endCol <= 7):
-                endPiece = board[endRow][endCol]
-                if (endPiece[0] != allyPiece): 
-                    possibleMoves.append(Move((row, col), (endRow, endCol), board))
-        
-        ## Check castling move
-        # ## TODO: Implement functionality of castleRights in which the spaces between two pieces should not be in check
-        # if allyPiece == "w":
-        #     if row == 7 and col == 4:
-        #         if board[row][col + 1] == "--" and board[row][col + 2] == "--" and castleRights.whiteKingSide: #Kingside castle
-        #             possibleMoves.append(Move((row, col), (row, col + 2), board))
-        #         if board[row][col - 1] == "--" and board[row][col - 2] == "--" and castleRights.whiteQueenSide: #Queenside Castle
-        #             possibleMoves.append(Move((row, col), (row, col - 2), board))
-        # if allyPiece == "b":
-        #     if row == 0 and col == 4:
-        #         if board[row][col + 1] == "--" and board[row][col + 2] == "--" and castleRights.blackKingSide: #Kingside castle
-        #             possibleMoves.append(Move((row, col), (row, col + 2), board))
-        #         if board[row][col - 1] == "--" and board[row][col - 2] == "--" and castleRights.blackQueenSide: #Queenside Castle
-        #             possibleMoves.append(Move((row, col), (row, col - 2), board))
-        return possibleMoves
\ No newline at end of file
+    def getCastleMoves(self, row: int, col: int, allyPiece: str):
+        """
+            Castling is only allowed when the squares between king and rook are empty, and
+            the king is not in check and does not pass through or land on an attacked square
+        """
+        homeRow = 7 if allyPiece == "w" else 0
+        if row != homeRow or col != 4: return []
+
+        castleRights = self.gamestate.castleRightsMask
+        kingSide = castleRights & (CastleRights.WHITE_KING_SIDE if allyPiece == "w" else CastleRights.BLACK_KING_SIDE)
+        queenSide = castleRights & (CastleRights.WHITE_QUEEN_SIDE if allyPiece == "w" else CastleRights.BLACK_QUEEN_SIDE)
+        if not kingSide and not queenSide: return []
+
+        board = self.gamestate.board
+        enemyPiece = "b" if allyPiece == "w" else "w"
+        isAttacked = lambda endCol: self.gamestate.isSquareAttacked((row, endCol), enemyPiece)
+        if isAttacked(col): return []
+
+        start = row * 8 + col
+        castleMoves = []
+        if kingSide and board[row][col + 3] == allyPiece + "R" and board[row][col + 1] == "--" and board[row][col + 2] == "--"\
+            and not isAttacked(col + 1) and not isAttacked(col + 2):
+            castleMoves.append(PackedMove.encode(start, start + 2, PackedMove.CASTLE_FLAG))
+        if queenSide and board[row][col - 4] == allyPiece + "R" and board[row][col - 1] == "--" and board[row][col - 2] == "--"\
+            and board[row][col - 3] == "--" and not isAttacked(col - 1) and not isAttacked(col - 2):
+            castleMoves.append(PackedMove.encode(start, start - 2, PackedMove.CASTLE_FLAG))
+        return castleMoves
@@ -0,0 +1,55 @@
+import random
+
+"""
+    Zobrist hashing tables
+
+    A position key is the XOR of one random 64-bit number per (piece, square), one for the side to move,
+    one per available castle right and one for the file of the en passant square.
+    Squares are indexed as row * 8 + col, matching GameState.board.
+"""
+_generator = random.Random(20230601) # Fixed seed so keys are identical across processes and runs
+
+PIECE_KEYS = {
+    piece: [_generator.getrandbits(64) for _ in range(64)]
+    for piece in ["wP", "wN", "wB", "wR", "wQ", "wK", "bP", "bN", "bB", "bR", "bQ", "bK"]
+}
+PIECE_KEYS["--"] = [0] * 64 # Empty squares do not contribute to the key
+
+# Keys of the pawn structure only (see computePawnKey), the pawns keep their piece keys and the other pieces count for nothing
+PAWN_KEYS = {piece: keys if piece[1] == "P" else [0] * 64 for piece, keys in PIECE_KEYS.items()}
+
+BLACK_TO_MOVE_KEY = _generator.getrandbits(64)
+
+# Keyed by the castle rights mask (see CastleRights.toMask), each entry being the XOR of the keys of its rights
+_castleRightKeys = [_generator.getrandbits(64) for _ in range(4)]
+CASTLE_RIGHTS_KEYS = [0] * 16
+for _mask in range(16):
+    for _bit in range(4):
+        if _mask & (1 << _bit): CASTLE_RIGHTS_KEYS[_mask] ^= _castleRightKeys[_bit]
+
+EN_PASSANT_FILE_KEYS = [_generator.getrandbits(64) for _ in range(8)]
+
+def enPassantKey(enPassantSquare) -> int:
+    return EN_PASSANT_FILE_KEYS[enPassantSquare[1]] if enPassantSquare != () else 0
+
+def computeKey(board, whiteTurn: bool, castleRightsMask: int, enPassantSquare) -> int:
+    """
+        Computes the key of a position from scratch.
+        GameState only calls this when a position is loaded, afterwards the key is updated incrementally
+    """
+    key = 0
+    for row in range(8):
+        for col in range(8):
+            key ^= PIECE_KEYS[board[row][col]][row * 8 + col]
+    if not whiteTurn: key ^= BLACK_TO_MOVE_KEY
+    return key ^ CASTLE_RIGHTS_KEYS[castleRightsMask] ^ enPassantKey(enPassantSquare)
+
+def computePawnKey(board) -> int:
+    """
+        Computes the key of the pawns of a position from scratch, equal for every position with the same pawns
+    """
+    key = 0
+    for row in range(8):
+        for col in range(8):
+            key ^= PAWN_KEYS[board[row][col]][row * 8 + col]
+    return key
@@ -4,24 +4,25 @@ Main Driver file
 import pygame
 from settings import *
 import domain.chess.ChessEngine as ChessEngine
+from domain.chess.BitboardEngine import BitboardGameState
 from domain.chess.Status import Status
 from features.chessGame.ChessUI import ChessUI
 from AI.ChessAI import ChessAI
+from AI.SearchWorker import SearchWorker
 from domain.chess.Piece import *
 from features.State import State
-from multiprocessing import Process, Queue
 import os
 
 class ChessGame(State):    
     """
         Class to run the game of Chess
     """
-    def __init__(self, game, isPlayerTwoHuman = True):
+    def __init__(self, game, isPlayerTwoHuman = True, useBitboard = False, aiTimeLimit = AI_MOVE_TIME_LIMIT):
         State.__init__(self, game)
         # pygame.init()
         self.clock = pygame.time.Clock()
 
-        self.gameState = ChessEngine.GameState()
+        self.gameState = BitboardGameState() if useBitboard else ChessEngine.GameState()
         self.isRunning = True
 
         self.squareSelected = ()
@@ -30,10 +31,11 @@ class ChessGame(State):
         self.chessUI = ChessUI(self.gameState, self.game.screen)
         self.moveToHighlight = []
 
-        self.chessAI = ChessAI()
-        self.AIProcess = None
+        self.chessAI = ChessAI(useBitboard = useBitboard, workers = AI_WORKERS, openingBookPath = AI_OPENING_BOOK)
+        self.aiTimeLimit = aiTimeLimit # Seconds per A.I move, None for the fixed depth search
+        self.searchWorker = SearchWorker(self.chessAI.getArguments()) # Same A.I, started on the first A.I move
         self.isAIInProgress = False
-        self.returnMoveQueue = Queue() 
+        self.aiMateText = None # "A.I: mate in N" once the A.I has found a forced mate, for either side
 
         self.isPlayerOneHuman = True
         self.isPlayerTwoHuman = isPlayerTwoHuman
@@ -45,7 +47,7 @@ class ChessGame(State):
     def draw(self, surface):
         self.chessUI.drawGameState(squareToHighlight=self.squareSelected, 
                                        showHighlight = True, moveToHighlight = self.moveToHighlight,
-                                       moveLog = self.gameState.moveLog)
+                                       moveLog = self.gameState.moveLog, infoText = self.aiMateText)
     
     def update(self, deltaTime, events):
         self.humanTurn = (self.gameState.whiteTurn and self.isPlayerOneHuman) or (not self.gameState.whiteTurn and self.isPlayerTwoHuman)
@@ -53,11 +55,16 @@ class ChessGame(State):
         for event in events:
             if event.type == pygame.QUIT:
                 self.stopAIProcess()
+                self.searchWorker.stop()
+                self.chessAI.close()
                 self.game.running = False
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_r:
                     self.reset()
                 elif event.key == pygame.K_ESCAPE:
+                    self.stopAIProcess()
+                    self.searchWorker.stop()
+                    self.chessAI.close()
                     self.exitState()
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button == 3: 
@@ -73,24 +80,31 @@ class ChessGame(State):
         A.I functions
     """
     def stopAIProcess(self):
-        if self.AIProcess != None:
-            self.AIProcess.terminate()
+        """
+            Stops the pending A.I search and drops its move, the worker itself keeps running for the next one
+        """
+        self.searchWorker.abandon()
         self.isAIInProgress = False
 
     def AIMoveWithProcess(self, deltaTime):
+        """
+            The A.I searches in the background (see SearchWorker), this checks every frame whether its move is ready
+        """
         if not self.isAIInProgress:
             self.isAIInProgress = True
             print("Thinking...")
             validMoves = self.gameState.getAllValidMoves(self.gameState.whiteTurn)
             if (len(validMoves) != 0):
-                self.AIProcess = Process(target = self.chessAI.generateMoveWithQueue, args = (self.gameState, validMoves, self.returnMoveQueue))
-                self.AIProcess.start()
+                self.searchWorker.requestMove(self.gameState, self.aiTimeLimit)
             else:
                 return
         
-        if self.AIProcess != None and not self.AIProcess.is_alive():
+        result = self.searchWorker.pollMove(self.gameState)
+        if result != None:
             print("Done thinking")
-            move = self.returnMoveQueue.get()
+            move, principalVariation, score = result
+            print("A.I line: " + " ".join(principalVariation))
+            self.updateMateText(score)
             self.gameState.performMove(move)
             if (len(self.gameState.moveLog)): 
                 self.performLastMoveEffects(deltaTime)
@@ -100,16 +114,28 @@ class ChessGame(State):
         self.isAIInProgress = True
         validMoves = self.gameState.getAllValidMoves(self.gameState.whiteTurn)
         if (len(validMoves) != 0):
-            self.gameState.performMove(self.chessAI.generateMove(self.gameState, validMoves))
+            self.gameState.performMove(self.chessAI.generateMove(self.gameState, validMoves, self.aiTimeLimit))
+            print("A.I line: " + " ".join(self.chessAI.getPrincipalVariation()))
+            self.updateMateText(self.chessAI.lastScore)
             if (len(self.gameState.moveLog)): 
                 self.performLastMoveEffects(deltaTime)
         self.isAIInProgress = False
+
+    def updateMateText(self, score):
+        """
+            Shows the mate the A.I has found with its last move, [score] being from its point of view
+        """
+        if score != None and self.chessAI.isMateScore(score):
+            self.aiMateText = "A.I: " + self.chessAI.formatScore(score)
+            print(self.aiMateText)
+        else: self.aiMateText = None
     
     """
         Main functions
     """
     def undoAction(self):
         self.gameState.undoMove()
+        self.aiMateText = None
 
         ##Terminate AI if it is still calculating moves
         if self.isAIInProgress:
@@ -185,6 +211,7 @@ class ChessGame(State):
 
         self.gameState.reset()
         self.clearSelected()
+        self.aiMateText = None
 
         self.humanTurn = (self.gameState.whiteTurn and self.isPlayerOneHuman) or (not self.gameState.whiteTurn and self.isPlayerTwoHuman)
 
@@ -46,7 +46,7 @@ class ChessUI:
     def drawPieces(self):
         for row in range(DIMENSION):
             for col in range(DIMENSION):
-                piece = self.gameState.board[row, col]
+                piece = self.gameState.board[row][col]
                 if (piece != "--"):
                     self.screen.blit(self.IMAGES[piece], (col * SQUARE_SIZE, row * SQUARE_SIZE))
 
@@ -107,7 +107,7 @@ class ChessUI:
 
     def drawGameState(self, squareToHighlight, 
                       showHighlight = False, moveToHighlight = None, moveLog = [], update = True,
-                      drawGameOverText = True):
+                      drawGameOverText = True, infoText = None):
         self.drawBoard()
         self.drawLastMoveHighlight()
         if (showHighlight): self.drawHighlight(squareToHighlight, moveToHighlight)
@@ -115,6 +115,7 @@ class ChessUI:
 
         if (drawGameOverText): self.drawGameOverText()
         self.drawMoveLog(moveLog)
+        if (infoText != None): self.drawInfoText(infoText)
         
         if update: pygame.display.update()
         
@@ -135,6 +136,13 @@ class ChessUI:
         pygame.draw.rect(self.screen, (100,100,100), rect)
         self.screen.blit(textObj, textRect)
 
+    def drawInfoText(self, text):
+        """
+            Draws [text] at the bottom of the move log
+        """
+        textObj = self.textMoveFont.render(text, 1, pygame.Color("White"))
+        self.screen.blit(textObj, (BOARD_WIDTH + self.textSpacing, BOARD_HEIGHT - self.moveLogTopPadding - textObj.get_height()))
+
     def drawMoveLog(self, moveLog = []):
         moveLogRect = pygame.Rect(BOARD_WIDTH - self.moveLogLeftBorder, 0 + self.moveLogTopBorder, MOVELOG_WIDTH, BOARD_HEIGHT)
         pygame.draw.rect(self.screen, self.moveLogBackgroundColor, moveLogRect)
@@ -6,6 +6,7 @@ from selenium.webdriver.chrome.service import Service
 
 from AI.ChessAI import ChessAI
 from bot.ChessAutomation import ChessAutomation
+from settings import AI_MOVE_TIME_LIMIT, AI_WORKERS, AI_OPENING_BOOK
 
 def setUpDriver() -> WebDriver:
     """
@@ -21,9 +22,10 @@ def setUpDriver() -> WebDriver:
 
 def main():
     driver = setUpDriver()
-    ai = ChessAI()
-    automate = ChessAutomation(driver, ai)
-    automate.run()
+    ai = ChessAI(workers = AI_WORKERS, openingBookPath = AI_OPENING_BOOK)
+    automate = ChessAutomation(driver, ai, moveTimeLimit = AI_MOVE_TIME_LIMIT)
+    try: automate.run()
+    finally: ai.close() # Stops the processes of a parallel A.I
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
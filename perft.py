@@ -0,0 +1,43 @@
+import argparse
+import sys
+from domain.chess.Perft import STANDARD_POSITIONS, runPerft
+
+"""
+    Perft command line tool
+
+    python perft.py                         -> every standard position to depth 3
+    python perft.py --position kiwipete -d 4 --divide
+    python perft.py --fen "<fen>" -d 5 --processes 4 --bitboard
+"""
+def parseArguments():
+    parser = argparse.ArgumentParser(description = "Count the move generation tree of chess positions")
+    parser.add_argument("-d", "--depth", type = int, default = 3, help = "number of plies to search")
+    parser.add_argument("--position", choices = [name for name, _, _ in STANDARD_POSITIONS], help = "run a single standard position")
+    parser.add_argument("--fen", help = "run a custom position instead of the standard ones")
+    parser.add_argument("--divide", action = "store_true", help = "list the node count of every root move")
+    parser.add_argument("--processes", type = int, default = 1, help = "split the root moves across this many processes")
+    parser.add_argument("--bitboard", action = "store_true", help = "use BitboardGameState instead of GameState")
+    parser.add_argument("--no-bulk", dest = "bulk", action = "store_false", help = "apply every leaf move instead of counting the last ply")
+    return parser.parse_args()
+
+def main():
+    arguments = parseArguments()
+    if arguments.fen != None: positions = [("custom", arguments.fen, [])]
+    else: positions = [position for position in STANDARD_POSITIONS if arguments.position in (None, position[0])]
+
+    failed = False
+    for name, fen, expectedCounts in positions:
+        result = runPerft(fen, arguments.depth, arguments.bitboard, arguments.bulk, arguments.divide, arguments.processes)
+        if result.divide != None:
+            for move, nodes in result.divide: print(f"{move}: {nodes}")
+
+        expected = expectedCounts[arguments.depth - 1] if 0 < arguments.depth <= len(expectedCounts) else None
+        verdict = "" if expected == None else " ok" if expected == result.nodes else f" MISMATCH (expected {expected})"
+        failed = failed or (expected != None and expected != result.nodes)
+        print(f"{name:<10} depth {arguments.depth}  nodes {result.nodes:>12}  time {result.seconds:8.3f}s  nps {result.nodesPerSecond():>10.0f}{verdict}")
+
+    # A non-zero exit code lets scripts use perft as a regression test
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import os
+
 BOARD_WIDTH = 512
 BOARD_HEIGHT = 512
 MOVELOG_WIDTH = 350
@@ -8,3 +10,11 @@ SCREEN_HEIGHT = BOARD_HEIGHT
 DIMENSION = 8
 SQUARE_SIZE = BOARD_HEIGHT//DIMENSION
 MAX_FPS = 15
+
+# Seconds the A.I may think per move, None to search a fixed depth instead
+AI_MOVE_TIME_LIMIT = 3
+# Processes the A.I splits its root moves across, 1 to search in a single process
+AI_WORKERS = 1
+# Polyglot opening book the A.I plays from while the game is in it, None to always search.
+# Found from this file, so the game and the bots can be started from any directory
+AI_OPENING_BOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Asset", "Books", "opening.bin")